@@ -1,7 +1,11 @@
-from flask import Flask, render_template, send_file, jsonify
+from flask import Flask, render_template, jsonify, request, Response, send_file, stream_with_context
+import json
 import os
-from scraper import scrape_and_process_dividends
-import pandas as pd
+import time
+from jobs import JobRunner, JobStore, FileLease
+from snapshot_cache import HistoryCache, SnapshotCache
+from dividend_store import get_store
+import metrics
 import logging
 
 app = Flask(__name__)
@@ -10,49 +14,227 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# CSV file path
-CSV_PATH = os.path.join('static', 'data', 'dividends_with_prices_current_month.csv')
+# Snapshot CSV written by earlier versions, imported into the store on first start
+LEGACY_CSV_PATH = os.path.join('static', 'data', 'dividends_with_prices_current_month.csv')
+SNAPSHOT_MAX_AGE = int(os.environ.get('SNAPSHOT_MAX_AGE', 3600))
+SCHEDULE_CHECK_INTERVAL = int(os.environ.get('SCHEDULE_CHECK_INTERVAL', 60))
+# A snapshot published this recently by another worker satisfies a refresh request
+REFRESH_COOLDOWN = int(os.environ.get('REFRESH_COOLDOWN', 60))
+# How long a worker waits on another worker's refresh before reporting failure
+REFRESH_WAIT_TIMEOUT = int(os.environ.get('REFRESH_WAIT_TIMEOUT', 1800))
+# /stream polls the pending snapshot this often. Each connection ends after STREAM_MAX_SECONDS,
+# below gunicorn's default 30 s timeout so even sync workers are not killed mid-stream; the
+# browser reconnects and resumes from Last-Event-ID.
+STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 1))
+STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', 25))
+STREAM_RETRY_MS = int(os.environ.get('STREAM_RETRY_MS', 1000))
+
+store = get_store()
+if store.version() is None and os.path.exists(LEGACY_CSV_PATH):
+    store.import_csv(LEGACY_CSV_PATH, time.strftime('%Y-%m', time.localtime(os.path.getmtime(LEGACY_CSV_PATH))))
+
+def snapshot_is_stale():
+    # Stale when there is no snapshot or the newest is older than SNAPSHOT_MAX_AGE (1 hour by default)
+    last_updated = store.last_updated()
+    if last_updated is None:
+        return True
+    return time.time() - last_updated >= SNAPSHOT_MAX_AGE
+
+# Held by whichever worker process is refreshing; the others keep serving the last published snapshot
+refresh_lease = FileLease()
+
+def run_refresh(progress):
+    # One refresh across all workers: the lease holder scrapes, the others wait for its snapshot
+    version = store.version()
+    if not refresh_lease.try_acquire():
+        progress("waiting for another worker")
+        if not refresh_lease.wait(REFRESH_WAIT_TIMEOUT):
+            raise RuntimeError("Timed out waiting for the refresh running in another worker")
+        if store.version() == version:
+            raise RuntimeError("The refresh in another worker did not publish a new snapshot")
+        return
+    try:
+        # Another worker may have published between our staleness check and taking the lease
+        last_updated = store.last_updated()
+        if last_updated is not None and time.time() - last_updated < REFRESH_COOLDOWN:
+            logger.info("Snapshot was published moments ago, skipping refresh")
+            return
+        # The scraping stack (playwright, yfinance, pandas, ...) is imported by the first refresh job,
+        # so workers that only serve reads never load it
+        from scraper import scrape_and_process_dividends
+        if not scrape_and_process_dividends(progress):
+            # Nothing was published, so the snapshot is still stale: fail the job to start the retry backoff
+            raise RuntimeError("The refresh found no dividend data")
+    finally:
+        refresh_lease.release()
+
+# Refreshes run in the background; concurrent requests join the in-flight job.
+# Job status goes through a shared store so any worker can report on any job.
+refresh_runner = JobRunner(run_refresh, JobStore())
+
+@app.before_request
+def start_scheduler():
+    # Started from the first request rather than at import, so with gunicorn --preload
+    # each forked worker gets its own live thread instead of the master's
+    if os.environ.get('REFRESH_SCHEDULE', '1') == '1':
+        refresh_runner.start_schedule(snapshot_is_stale, SCHEDULE_CHECK_INTERVAL)
+
+@app.before_request
+def share_metrics():
+    # Only processes that serve requests publish their counters to /metrics
+    metrics.start_sharing()
 
 @app.route('/')
 def index():
-    # Check if CSV exists and is recent (e.g., within 1 hour)
-    if os.path.exists(CSV_PATH):
-        file_age = time.time() - os.path.getmtime(CSV_PATH)
-        if file_age < 3600:  # 1 hour
-            return render_template('index.html')
-    
-    # Trigger scraper if no recent CSV
-    try:
-        scrape_and_process_dividends()
-        logger.info("Dividend data scraped and saved to CSV")
-    except Exception as e:
-        logger.error(f"Error scraping dividends: {e}")
+    # Never scrape inline: kick off a background refresh and serve the last snapshot
+    if not refresh_runner.backing_off and snapshot_is_stale():
+        job, started = refresh_runner.submit()
+        if started:
+            logger.info(f"Snapshot stale, started refresh job {job.id}")
+    job = refresh_runner.current
+    if job is not None and job.status == 'failed':
         return render_template('index.html', error="Failed to fetch dividend data")
-    
     return render_template('index.html')
 
 @app.route('/refresh')
 def refresh_data():
+    job, started = refresh_runner.submit()
+    return jsonify({"status": "accepted", "started": started, "job": job.to_dict()}), 202
+
+@app.route('/refresh/<job_id>')
+def refresh_status(job_id):
+    job = refresh_runner.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown refresh job"}), 404
+    return jsonify(job.to_dict())
+
+def sse(event, data, event_id=None):
+    id_line = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{id_line}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def stream_position(last_event_id):
+    # (snapshot id, last row id) from a "snapshot:row" event id, or (None, 0)
     try:
-        scrape_and_process_dividends()
-        return jsonify({"status": "success", "message": "Data refreshed successfully"})
-    except Exception as e:
-        logger.error(f"Error refreshing dividends: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        snapshot_id, after = (int(part) for part in (last_event_id or '').split(':'))
+    except ValueError:
+        return None, 0
+    return snapshot_id, after
+
+@app.route('/stream')
+def stream_refresh():
+    # Server-Sent Events for a refresh: "progress" (job status), "rows" (rows appended to the
+    # pending snapshot since the last event) and a final "done". Rows and job status both come
+    # from shared stores, so any worker can stream any refresh. For a job no worker knows (e.g.
+    # pruned or mistyped), rows of the pending snapshot are streamed until it is published or
+    # discarded and "done" reports status "unknown", since the outcome cannot be known.
+    # Row events carry "snapshot:row" ids, so a reconnect carries on where the last connection stopped.
+    job_id = request.args.get('job')
+    if not job_id and refresh_runner.current is not None:
+        job_id = refresh_runner.current.id
+    resume_snapshot, resume_after = stream_position(request.headers.get('Last-Event-ID'))
+
+    def events():
+        snapshot_id, after, last_progress = resume_snapshot, resume_after, None
+        deadline = time.time() + STREAM_MAX_SECONDS
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        while time.time() < deadline:
+            # Re-read each time: a job run by another worker is a copy of its last saved state
+            job = refresh_runner.get(job_id) if job_id else None
+            finished = job.finished if job is not None else store.pending_snapshot() is None
+            if job is not None:
+                progress = job.to_dict()
+                if progress != last_progress:
+                    yield sse('progress', progress)
+                    last_progress = progress
+            pending = store.pending_snapshot()
+            if pending is not None and pending != snapshot_id:
+                snapshot_id, after = pending, 0
+                yield sse('snapshot', {'id': snapshot_id})
+            if snapshot_id is not None:
+                after, rows = store.snapshot_rows(snapshot_id, after)
+                if rows:
+                    yield sse('rows', rows, f"{snapshot_id}:{after}")
+            if finished:
+                yield sse('done', {
+                    'status': job.status if job is not None else 'unknown',
+                    'error': job.error if job is not None else f"Unknown refresh job {job_id or ''}".rstrip(),
+                    'version': store.version(),
+                })
+                return
+            time.sleep(STREAM_POLL_INTERVAL)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/download')
 def download_csv():
-    if os.path.exists(CSV_PATH):
-        return send_file(CSV_PATH, as_attachment=True)
-    else:
+    # CSV generated from the store: ?month=YYYY-MM, defaults to the latest month
+    month = request.args.get('month') or store.latest_month()
+    if month is None or month not in store.months():
         return "CSV file not found", 404
+    path = store.export_csv_file(month)
+    filename = ('dividends_with_prices_current_month.csv' if month == store.latest_month()
+                else f'dividends_with_prices_{month}.csv')
+    # Versioned file per published snapshot: conditional requests get 304 until the month is republished
+    return send_file(os.path.abspath(path), mimetype='text/csv', as_attachment=True, download_name=filename,
+                     max_age=0)
+
+def load_snapshot_rows():
+    return store.query(month=store.latest_month())
+
+# Serialized /data responses for the latest month, rebuilt only when a new snapshot is stored
+snapshot_cache = SnapshotCache(store.version, load_snapshot_rows)
+
+def load_history_rows(key):
+    month, year, region, symbol, source = key
+    return store.query(month=month, year=year, region=region, symbol=symbol, source=source, include_month=True)
+
+# Cross-month reads (?month= or ?year=) go to the store's indexes once per published version
+history_cache = HistoryCache(store.version, load_history_rows)
+
+def history_payload(args):
+    def split(param):
+        # Filters are case-insensitive, so equivalent reads share a cache entry
+        if not args.get(param):
+            return None
+        return tuple(sorted({value.strip().upper() for value in args[param].split(',')}))
+
+    snapshot = history_cache.get((args.get('month'), args.get('year'), split('region'), split('symbol'),
+                                  split('source')))
+    return snapshot.query({key: value for key, value in args.items() if key not in ('region', 'symbol', 'source')})
 
 @app.route('/data')
 def get_data():
-    if os.path.exists(CSV_PATH):
-        df = pd.read_csv(CSV_PATH)
-        return jsonify(df.to_dict(orient='records'))
-    return jsonify([]), 404
+    # Optional query parameters: region, symbol, source (comma-separated), sort, order, offset, limit,
+    # and month (YYYY-MM) or year (YYYY) to read history instead of the latest month
+    try:
+        if request.args.get('month') or request.args.get('year'):
+            payload = history_payload(request.args)
+        else:
+            snapshot = snapshot_cache.current()
+            if snapshot is None:
+                return jsonify([]), 404
+            payload = snapshot.query(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    encoding, body, etag = payload.variant(request.accept_encodings)
+    if any(request.if_none_match.contains(tag) for tag in payload.etags()):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    # Prometheus text format; counters are summed over every worker through files in data/metrics,
+    # and the last refresh summary is shared the same way
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# Every article ingested so far, with its validators and extracted dividend rows
+LEDGER_PATH = os.environ.get('ARTICLE_LEDGER_PATH', os.path.join('data', 'article_ledger.sqlite3'))
+# Articles whose fetch failed stay pending and are retried by later refreshes this many times
+MAX_FETCH_ATTEMPTS = int(os.environ.get('ARTICLE_MAX_FETCH_ATTEMPTS', 5))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    month TEXT NOT NULL,
+    content_hash TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    rows TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    fetched_at REAL NOT NULL,
+    pending INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS articles_month ON articles (month, first_seen);
+"""
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def month_key(date):
+    return date.strftime('%Y-%m')
+
+
+class ArticleLedger:
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            existing = {row['name'] for row in self._conn.execute('PRAGMA table_info(articles)')}
+            for name in ('pending', 'attempts'):
+                if name not in existing:
+                    self._conn.execute(f'ALTER TABLE articles ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0')
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM articles WHERE url = ?', (url,)).fetchone()
+        return self._decode(row) if row else None
+
+    def known(self, urls):
+        # Successfully ingested urls among urls; pending ones do not count, so pagination does not stop on them
+        urls = list(urls)
+        if not urls:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT url FROM articles WHERE pending = 0 AND url IN ({','.join('?' * len(urls))})", urls
+            ).fetchall()
+        return {row['url'] for row in rows}
+
+    def for_month(self, month):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM articles WHERE month = ? AND pending = 0 ORDER BY first_seen', (month,)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def pending(self, max_attempts=MAX_FETCH_ATTEMPTS):
+        # Articles never fetched successfully that are still worth retrying
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM articles WHERE pending = 1 AND attempts < ? ORDER BY first_seen', (max_attempts,)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def conditional_headers(self, url):
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, url, title, month, digest, etag, last_modified, rows):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO articles (url, title, month, content_hash, etag, last_modified, rows, first_seen, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET title = excluded.title, content_hash = excluded.content_hash, '
+                'etag = excluded.etag, last_modified = excluded.last_modified, rows = excluded.rows, '
+                'fetched_at = excluded.fetched_at, pending = 0, attempts = 0',
+                (url, title, month, digest, etag, last_modified, json.dumps(rows), now, now)
+            )
+
+    def record_failure(self, url, title, month):
+        # A new article that could not be fetched is kept as pending, with no rows, for later runs to retry;
+        # an article ingested before keeps its last good extraction
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO articles (url, title, month, rows, first_seen, fetched_at, pending, attempts) '
+                "VALUES (?, ?, ?, '[]', ?, ?, 1, 1) "
+                'ON CONFLICT(url) DO UPDATE SET attempts = attempts + 1, fetched_at = excluded.fetched_at '
+                'WHERE pending = 1',
+                (url, title, month, now, now)
+            )
+
+    def touch(self, url):
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE articles SET fetched_at = ? WHERE url = ?', (time.time(), url))
+
+    def _decode(self, row):
+        entry = dict(row)
+        entry['rows'] = json.loads(entry['rows'])
+        return entry
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = ArticleLedger()
+        return _ledger
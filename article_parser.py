@@ -0,0 +1,198 @@
+import os
+import re
+import zipfile
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+from names import clean_instrument_name
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# auto picks the fastest installed engine; html.parser needs nothing beyond BeautifulSoup
+PARSER_ENGINE = os.environ.get('PARSER_ENGINE', 'auto')
+# Process-pool parsing kicks in for batches of at least PARSE_POOL_MIN articles when PARSE_WORKERS > 1;
+# the scraper hands over ARTICLE_BATCH articles at a time, so keep PARSE_POOL_MIN at or below that
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 1))
+PARSE_POOL_MIN = int(os.environ.get('PARSE_POOL_MIN', 8))
+# Article text dumps, one zip per post month ({month}.zip)
+TEXT_ARCHIVE_DIR = os.environ.get('TEXT_ARCHIVE_DIR', os.path.join('data', 'article_text'))
+
+DIVIDEND_PATTERN = re.compile(
+    r'(\w[\w\s]+?)\s+(?:dividend|pays|declares)\s+.*?([\d.]+)\s*(ZAR|USD|EUR|$|€|cents|pence)?',
+    re.IGNORECASE
+)
+
+
+def decode(content):
+    # Same encoding detection BeautifulSoup applies to bytes, so every engine sees the same text
+    if isinstance(content, bytes):
+        return UnicodeDammit(content, is_html=True).unicode_markup or ''
+    return content
+
+
+def paragraphs_html_parser(content):
+    soup = BeautifulSoup(decode(content), 'html.parser')
+    return [p.text for p in soup.find_all('p')]
+
+
+def paragraphs_lxml(content):
+    markup = decode(content)
+    if not markup.strip():
+        return []
+    return [p.text_content() for p in lxml.html.document_fromstring(markup).iter('p')]
+
+
+def paragraphs_selectolax(content):
+    return [p.text(deep=True) for p in HTMLParser(decode(content)).css('p')]
+
+
+ENGINES = {
+    'selectolax': paragraphs_selectolax if HTMLParser is not None else None,
+    'lxml': paragraphs_lxml if lxml is not None else None,
+    'html.parser': paragraphs_html_parser,
+}
+
+
+def available_engines():
+    return [name for name, paragraphs in ENGINES.items() if paragraphs is not None]
+
+
+def get_engine(name=None):
+    name = name or PARSER_ENGINE
+    if name == 'auto':
+        return available_engines()[0]
+    if ENGINES.get(name) is None:
+        raise ValueError(f"Parser engine {name} is not available; installed: {', '.join(available_engines())}")
+    return name
+
+
+def extract_entries(paragraphs):
+    # {instrument: {"Dividends": text}} and the article's plain text, one paragraph per line
+    entries = {}
+    lines = []
+    for paragraph in paragraphs:
+        text = paragraph.strip()
+        lines.append(text)
+        lowered = text.lower()
+        if 'per share' in lowered:
+            parts = text.split('will be paying ')
+            if len(parts) > 1:
+                instrument = clean_instrument_name(parts[0])
+                if instrument:
+                    entries[instrument] = {"Dividends": parts[-1].replace('per share.', "")}
+        elif 'dividend' in lowered:
+            match = DIVIDEND_PATTERN.search(text)
+            if match:
+                instrument = clean_instrument_name(match.group(1))
+                if instrument:
+                    currency = match.group(3) or ''
+                    entries[instrument] = {"Dividends": f"{match.group(2)} {currency}".strip()}
+    return entries, ''.join(line + '\n' for line in lines)
+
+
+def parse_article(content, engine=None):
+    return extract_entries(ENGINES[get_engine(engine)](content))
+
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers):
+    # One pool per process, reused by every batch. Workers are spawned rather than forked: refreshes
+    # run in a thread of a multi-threaded web worker, where forking can copy held locks.
+    global _pool, _pool_key
+    key = (os.getpid(), workers)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None and _pool_key[0] == os.getpid():
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_key = key
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_key[0] == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def parse_articles(contents, engine=None, workers=PARSE_WORKERS):
+    # (entries, text) for each article, in order; large batches are spread over worker processes
+    contents = list(contents)
+    engine = get_engine(engine)
+    if workers <= 1 or len(contents) < PARSE_POOL_MIN:
+        return [parse_article(content, engine) for content in contents]
+    chunksize = max(1, len(contents) // (workers * 4))
+    try:
+        return list(get_pool(workers).map(parse_article, contents, [engine] * len(contents), chunksize=chunksize))
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory): start a fresh pool next time and parse this batch here
+        logger.warning("Parse worker pool broke, parsing batch in-process")
+        reset_pool()
+        return [parse_article(content, engine) for content in contents]
+
+
+class TextArchive:
+    # Deflated zips of {name}.txt article dumps, one per post month, written member by member as
+    # articles are parsed. On close, members of a month's previous archive that were not rewritten
+    # are carried over; months no article was added to are left untouched.
+    def __init__(self, directory=TEXT_ARCHIVE_DIR):
+        self.directory = directory
+        self._archives = {}
+        self._names = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, month):
+        return os.path.join(self.directory, f"{month}.zip")
+
+    def add(self, name, text, month):
+        member = f"{name}.txt"
+        names = self._names.setdefault(month, set())
+        if member in names:
+            return
+        if month not in self._archives:
+            self._archives[month] = zipfile.ZipFile(f"{self.path(month)}.tmp", 'w', compression=zipfile.ZIP_DEFLATED)
+        names.add(member)
+        self._archives[month].writestr(member, text)
+
+    def close(self):
+        for month, archive in self._archives.items():
+            path = self.path(month)
+            if os.path.exists(path):
+                try:
+                    with zipfile.ZipFile(path) as previous:
+                        for info in previous.infolist():
+                            if info.filename not in self._names[month]:
+                                archive.writestr(info, previous.read(info))
+                except zipfile.BadZipFile:
+                    logger.warning(f"Discarding unreadable text archive {path}")
+            archive.close()
+            os.replace(f"{path}.tmp", path)
+        self._archives = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,84 @@
+"""Worker start-up cost of the web app: import time and resident memory.
+
+Each sample imports app in a fresh interpreter, as a gunicorn worker (or the
+--preload master) does, and reports the import wall-clock time, RSS, module
+count and which parts of the scraping stack got loaded. The "eager" variant
+also imports scraper, which is what every worker paid before app.py started
+importing it only inside refresh jobs. Run from the repository root:
+
+    python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'numpy', 'yfinance', 'playwright', 'googlesearch', 'tqdm', 'bs4', 'requests']
+
+PROBE = """
+import json, os, sys, time
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+sys.path.insert(0, {root!r})
+os.environ['REFRESH_SCHEDULE'] = '0'
+baseline_rss = rss_mb()
+baseline_modules = len(sys.modules)
+started = time.perf_counter()
+import app
+{extra}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': rss_mb(),
+    'rss_delta_mb': rss_mb() - baseline_rss,
+    'modules': len(sys.modules) - baseline_modules,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+VARIANTS = {
+    'lazy': '',
+    'eager': 'import scraper',
+}
+
+
+def sample(variant, workdir):
+    code = PROBE.format(root=ROOT, extra=VARIANTS[variant], heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], cwd=workdir, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per variant; medians are reported')
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    args = parser.parse_args()
+
+    # app.py opens its store relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='bench-import-')
+    try:
+        sample(args.variants[0], workdir)  # creates the store so every timed sample sees the same state
+        print(f"{'variant':>8} {'import ms':>10} {'RSS MB':>8} {'+RSS MB':>8} {'modules':>8}  scraping stack loaded")
+        for variant in args.variants:
+            samples = [sample(variant, workdir) for _ in range(args.repeat)]
+            seconds = statistics.median(s['seconds'] for s in samples)
+            rss = statistics.median(s['rss_mb'] for s in samples)
+            delta = statistics.median(s['rss_delta_mb'] for s in samples)
+            print(f"{variant:>8} {seconds * 1000:>10.1f} {rss:>8.1f} {delta:>8.1f} {samples[-1]['modules']:>8}"
+                  f"  {', '.join(samples[-1]['heavy']) or '-'}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Lookups per second of the local JSE instrument index.
+
+Builds an index of synthetic instrument names and times exact, misspelled
+and abbreviated queries against it. Run from the repository root:
+
+    python benchmarks/bench_jse_index.py --names 5000 --queries 20000
+    python benchmarks/bench_jse_index.py --threshold 0.8 --margin 0.05   # tune best_match
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jse_index import MATCH_MARGIN, MATCH_THRESHOLD, JSEIndex  # noqa: E402
+
+WORDS = [
+    'Anglo', 'American', 'Sasol', 'Capitec', 'Shoprite', 'Naspers', 'Growthpoint', 'Redefine',
+    'Sibanye', 'Stillwater', 'Absa', 'Nedbank', 'Investec', 'Sanlam', 'Discovery', 'Mondi',
+    'Bidvest', 'Tiger', 'Brands', 'Pick', 'Pay', 'Vodacom', 'Telkom', 'Exxaro', 'Kumba', 'Iron',
+    'Ore', 'Harmony', 'Gold', 'Impala', 'Platinum', 'Northam', 'Resilient', 'Hyprop', 'Fortress',
+    'Attacq', 'Equites', 'Vukile', 'Emira', 'Octodec', 'Stor', 'Age', 'Coronation', 'Fund',
+    'Managers', 'Santam', 'Momentum', 'Metropolitan', 'Old', 'Mutual', 'Reinet', 'Remgro',
+]
+SUFFIXES = ['Limited', 'Ltd', 'Holdings', 'Property Fund', 'Properties', 'Financial Services',
+            'Investments', 'Group', 'REIT', 'Funding']
+
+
+def make_names(count, rng):
+    names = set()
+    while len(names) < count:
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        names.add(' '.join(words + [rng.choice(SUFFIXES)]))
+    return sorted(names)
+
+
+def perturb(name, rng):
+    choice = rng.random()
+    if choice < 0.3:
+        return name
+    if choice < 0.6:
+        # drop or swap one character
+        i = rng.randrange(1, len(name) - 1)
+        return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    if choice < 0.8:
+        return name.replace('Limited', 'Ltd').replace('Property', 'Prop').replace('Holdings', 'Hldgs')
+    return ' '.join(name.split()[:2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threshold', type=float, default=MATCH_THRESHOLD)
+    parser.add_argument('--margin', type=float, default=MATCH_MARGIN, help='required lead over the runner-up')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = make_names(args.names, rng)
+    index = JSEIndex(path=os.devnull)
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        index.add(name, f"C{i:05d}", f"https://www.jse.co.za/instruments/C{i:05d}")
+    build_time = time.perf_counter() - start
+
+    queries = [(name, perturb(name, rng)) for name in rng.choices(names, k=args.queries)]
+    hits = correct = 0
+    start = time.perf_counter()
+    for expected, query in queries:
+        entry, _ = index.best_match(query, threshold=args.threshold, margin=args.margin)
+        if entry is not None:
+            hits += 1
+            correct += entry['name'] == expected
+    elapsed = time.perf_counter() - start
+
+    print(f"index size:        {len(index)} names (built in {build_time * 1000:.1f} ms)")
+    print(f"queries:           {len(queries)} (threshold {args.threshold}, margin {args.margin})")
+    print(f"lookups/second:    {len(queries) / elapsed:,.0f}")
+    print(f"mean latency:      {elapsed / len(queries) * 1e6:.1f} us")
+    print(f"above threshold:   {hits / len(queries):.1%}")
+    print(f"correct when hit:  {correct / max(hits, 1):.1%}")
+
+
+if __name__ == '__main__':
+    main()
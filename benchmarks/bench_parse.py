@@ -0,0 +1,77 @@
+"""Article parse throughput for each installed extraction engine.
+
+Parses a fixed corpus of synthetic dividend articles (benchmarks/replay.py),
+padded with blog-style navigation and filler markup, with every engine
+article_parser can load, checks that each produces exactly the same entries
+and text as html.parser, and reports articles and megabytes per second.
+Run from the repository root:
+
+    python benchmarks/bench_parse.py --articles 500 --padding 200
+    python benchmarks/bench_parse.py --workers 4     # process-pool parsing too
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import article_parser  # noqa: E402
+from replay import Corpus  # noqa: E402
+
+NAVIGATION = ''.join(f'<li><a href="/topic/{i}">Topic {i}</a></li>' for i in range(40))
+FILLER = ('<p>Markets were mixed this week as investors weighed <strong>interest rate</strong> '
+          'expectations against <a href="/earnings">earnings</a> updates &amp; commodity prices.</p>')
+
+
+def build_corpus(articles, padding, seed):
+    # Same bytes for the same arguments, so results are comparable across runs and machines
+    corpus = Corpus(articles=articles, seed=seed)
+    documents = []
+    for article in corpus.articles:
+        page = corpus.article_page(article['slug'])
+        page = page.replace('<body>', f'<body><header><nav><ul>{NAVIGATION}</ul></nav></header>'
+                                      f'<script>window.dataLayer = [];</script><article>')
+        page = page.replace('</body>', f'{FILLER * padding}</article><footer>{NAVIGATION}</footer></body>')
+        documents.append(page.encode('utf-8'))
+    return documents
+
+
+def time_engine(documents, engine, workers, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = article_parser.parse_articles(documents, engine=engine, workers=workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=500)
+    parser.add_argument('--padding', type=int, default=200, help='filler paragraphs per article')
+    parser.add_argument('--workers', type=int, default=1, help='also time process-pool parsing with this many workers')
+    parser.add_argument('--repeat', type=int, default=3, help='report the best of this many runs')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    documents = build_corpus(args.articles, args.padding, args.seed)
+    megabytes = sum(len(document) for document in documents) / 1e6
+    print(f"corpus: {len(documents)} articles, {megabytes:.1f} MB")
+
+    article_parser.PARSE_POOL_MIN = 1
+    reference = None
+    print(f"{'engine':>12} {'workers':>7} {'seconds':>8} {'art/s':>9} {'MB/s':>7} {'same':>5}")
+    for engine in reversed(article_parser.available_engines()):
+        for workers in sorted({1, args.workers}):
+            elapsed, results = time_engine(documents, engine, workers, args.repeat)
+            if reference is None:
+                reference = results
+            same = 'yes' if results == reference else 'NO'
+            print(f"{engine:>12} {workers:>7} {elapsed:>8.3f} {len(documents) / elapsed:>9.1f}"
+                  f" {megabytes / elapsed:>7.2f} {same:>5}")
+
+
+if __name__ == '__main__':
+    main()
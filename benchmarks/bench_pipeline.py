@@ -0,0 +1,190 @@
+"""End-to-end, offline benchmark of the scraping pipeline.
+
+Each run serves a synthetic corpus of N articles (plus any recorded
+fixtures) from benchmarks/replay.py, points http_client, the Playwright
+page, yfinance and googlesearch at it, and times every stage of a refresh in
+a fresh working directory. Stages stream into each other, so the times are
+the totals metrics.stage() records for each one:
+
+    scrape     the article listing and its "load more" pagination
+    process    article downloads and extraction
+    resolve    instrument resolution (JSE index/search, Google, caches)
+    price      batched yfinance pricing
+    save       normalization, pending-snapshot appends and the publish
+
+With --pagination browser (the default) each run is scraper's own
+scrape_and_process_dividends(), headless Chromium included. Machines without
+a Playwright browser can use --pagination http, which walks the ?page=N
+listing pages with BeautifulSoup instead; its scrape column leaves out the
+browser entirely and is not comparable with browser runs.
+
+    python benchmarks/bench_pipeline.py --sizes 10 100 1000 --latency 0.02 --rate-429 0.01
+    python benchmarks/bench_pipeline.py --sizes 100 --warm   # second, incremental run too
+    python benchmarks/bench_pipeline.py --fixtures fixtures/ --sizes 10   # recorded responses first
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import article_ledger  # noqa: E402
+import dividend_store  # noqa: E402
+import http_client  # noqa: E402
+import jse_index  # noqa: E402
+import metrics  # noqa: E402
+import resolution_cache  # noqa: E402
+import scraper  # noqa: E402
+from replay import Corpus, ReplayServer, ReplaySearch, ReplayYFinance  # noqa: E402
+
+STAGES = ['scrape', 'process', 'resolve', 'price', 'save']
+
+
+def reset_state(real_rates):
+    # Module-level singletons open files relative to the working directory
+    resolution_cache._cache = None
+    article_ledger._ledger = None
+    dividend_store._store = None
+    jse_index._index = None
+    http_client.limiter = http_client.RateLimiter() if real_rates else http_client.RateLimiter({}, 10000)
+    scraper.limiter = http_client.limiter
+    http_client.retry_budget.reset()
+
+
+def browser_available():
+    from playwright.sync_api import sync_playwright
+    try:
+        with sync_playwright() as p:
+            p.chromium.launch(headless=True).close()
+        return True
+    except Exception:
+        return False
+
+
+def paginate_http():
+    # {"link", "date"} per card, walking the listing's ?page=N pages without a browser
+    articles, page = [], 0
+    while True:
+        response = http_client.fetch(f"{scraper.BLOG_URL}?page={page}")
+        soup = BeautifulSoup(response.text, 'html.parser')
+        for card in soup.select('a.LinkBox'):
+            date_tag = card.find_parent().select_one('div.post-date')
+            post_date = scraper.parse_post_date(date_tag.text) if date_tag else None
+            articles.append({'link': card.get('href', ''),
+                             'date': post_date.strftime('%Y-%m-%d') if post_date else None})
+        if soup.select_one('a#loadMore') is None:
+            return articles
+        page += 1
+
+
+def run_once(pagination):
+    # (stage totals, articles listed, rows saved) for one refresh
+    if pagination == 'browser':
+        rows = scraper.scrape_and_process_dividends()
+        with open(metrics.LAST_REFRESH_PATH, 'r', encoding='utf-8') as f:
+            stages = json.load(f)['stages']
+    else:
+        metrics.start_run()
+        with metrics.stage('scrape'):
+            articles = paginate_http()
+            os.makedirs(os.path.dirname(scraper.LINKS_PATH), exist_ok=True)
+            with open(scraper.LINKS_PATH, 'w', encoding='utf-8') as f:
+                for article in articles:
+                    f.write(json.dumps(article) + '\n')
+        rows = scraper.save_rows(scraper.iter_priced_rows(scraper.iter_articles(scraper.LINKS_PATH)))
+        stages = metrics.finish_run(rows)['stages']
+    with open(scraper.LINKS_PATH, 'r', encoding='utf-8') as f:
+        listed = sum(1 for line in f if line.strip())
+    return stages, listed, rows
+
+
+def bench(size, args):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{size}-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    try:
+        reset_state(args.real_rates)
+        corpus = Corpus(articles=size, seed=args.seed)
+        server = ReplayServer(corpus, fixtures_dir=args.fixtures, latency=(0, args.latency),
+                              rate_429=args.rate_429, seed=args.seed)
+        with server:
+            scraper.yf, scraper.search = ReplayYFinance(server), ReplaySearch(server)
+            scraper.page_hooks.append(server.route_page)
+            try:
+                for run in range(2 if args.warm else 1):
+                    requests_before, throttled_before = server.requests, server.throttled
+                    started = time.perf_counter()
+                    totals, articles, rows = run_once(args.pagination)
+                    elapsed = time.perf_counter() - started
+                    results.append({
+                        'articles': size,
+                        'pagination': args.pagination,
+                        'run': 'warm' if run else 'cold',
+                        'stages': {name: round(seconds, 4) for name, seconds in totals.items()},
+                        'total_seconds': round(elapsed, 4),
+                        'articles_per_second': round(articles / elapsed, 2) if elapsed else None,
+                        'rows': rows,
+                        'requests': server.requests - requests_before,
+                        'throttled': server.throttled - throttled_before,
+                    })
+            finally:
+                scraper.page_hooks.remove(server.route_page)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_table(results):
+    header = f"{'articles':>8} {'run':>5} " + ' '.join(f"{stage:>10}" for stage in STAGES)
+    header += f" {'total':>8} {'art/s':>8} {'rows':>6} {'reqs':>6} {'429s':>5}"
+    if results:
+        print(f"pagination: {results[0]['pagination']}")
+    print(header)
+    for result in results:
+        line = f"{result['articles']:>8} {result['run']:>5} "
+        line += ' '.join(f"{result['stages'].get(stage, 0):>10.3f}" for stage in STAGES)
+        line += (f" {result['total_seconds']:>8.2f} {result['articles_per_second']:>8.1f}"
+                 f" {result['rows']:>6} {result['requests']:>6} {result['throttled']:>5}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--latency', type=float, default=0.0, help='max injected latency per request, seconds')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--real-rates', action='store_true', help='keep production per-host rate limits')
+    parser.add_argument('--warm', action='store_true', help='repeat each size to measure an incremental run')
+    parser.add_argument('--pagination', choices=['browser', 'http'], default='browser',
+                        help='list articles with Playwright (scraper\'s own code) or a plain HTTP page walk')
+    parser.add_argument('--fixtures', help='recorded fixtures (benchmarks/replay.py record) to serve first')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+    if args.pagination == 'browser' and not browser_available():
+        parser.error("--pagination browser needs a Playwright browser (playwright install chromium); "
+                     "use --pagination http to benchmark without one")
+
+    import logging
+    logging.disable(logging.INFO)
+
+    results = []
+    for size in args.sizes:
+        results += bench(size, args)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+"""Offline record/replay stand-in for the sites the scraping pipeline talks to.
+
+The scraper reaches the outside world through four clients, and each is
+recorded and replayed at its own boundary:
+
+    http_client    easyequities articles, JSE search and instrument pages
+    Playwright     the easyequities listing and its "load more" requests
+    googlesearch   search() results
+    yfinance       prices and currency/exchange, as the scraper reads them
+
+ReplayServer is a local HTTP server. http_client requests reach it through
+http_client.url_rewriter, which turns https://host/path?query into
+http://127.0.0.1:<port>/host/path?query, so per-host rate limiting still sees
+the real host names. Playwright pages are routed to the same responses with
+route_page(), installed through scraper.page_hooks; anything else the browser
+asks for is aborted. ReplaySearch and ReplayYFinance stand in for the
+googlesearch and yfinance modules in-process. Each answer comes from a
+recorded fixture when one matches, and otherwise from a deterministic
+synthetic corpus. Latency and 429 rates can be injected.
+
+Record fixtures from a live run (needs network and a Playwright browser):
+
+    python benchmarks/replay.py record fixtures/
+
+Serve the HTTP fixtures, with a synthetic fallback (benchmarks/bench_pipeline.py
+installs the browser, search and yfinance stand-ins as well):
+
+    python benchmarks/replay.py serve --fixtures fixtures/ --latency 0.05 --rate-429 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client  # noqa: E402
+
+BLOG_HOST = 'blogs.easyequities.co.za'
+JSE_HOST = 'www.jse.co.za'
+LISTING_PAGE_SIZE = 10
+JSE_LISTING_PAGE_SIZE = 100
+# Browser responses worth keeping; images and fonts are not needed to replay the listing
+RECORDED_RESOURCE_TYPES = ('document', 'script', 'stylesheet', 'xhr', 'fetch')
+SEARCH_FIXTURES = 'search.json'
+YFINANCE_FIXTURES = 'yfinance.json'
+
+# The synthetic listing's "load more": appends the next page of cards, like the blog's own script
+LOAD_MORE_SCRIPT = '''<script>
+let page = 0;
+document.addEventListener('click', async event => {
+    if (event.target.id !== 'loadMore') return;
+    event.preventDefault();
+    page += 1;
+    const response = await fetch(`${location.pathname}?page=${page}&fragment=1`);
+    const cards = await response.text();
+    event.target.remove();
+    document.getElementById('posts').insertAdjacentHTML('beforeend', cards);
+});
+</script>'''
+
+WORDS = ['Anglo', 'Sasol', 'Capitec', 'Shoprite', 'Growthpoint', 'Redefine', 'Sibanye', 'Absa',
+         'Nedbank', 'Investec', 'Sanlam', 'Discovery', 'Mondi', 'Bidvest', 'Tiger', 'Vodacom',
+         'Telkom', 'Exxaro', 'Kumba', 'Harmony', 'Impala', 'Northam', 'Resilient', 'Hyprop',
+         'Fortress', 'Attacq', 'Equites', 'Vukile', 'Emira', 'Octodec', 'Coronation', 'Santam',
+         'Momentum', 'Reinet', 'Remgro', 'Astral', 'Barloworld', 'Clicks', 'Dischem', 'Famous']
+SUFFIXES = ['Limited', 'Holdings Limited', 'Property Fund Limited', 'Group', 'Properties Limited']
+
+
+def fixture_key(url, method='GET', post_data=None):
+    # Plain GETs are keyed by URL alone; other requests (e.g. "load more" POSTs) by method and body too
+    if method == 'GET' and not post_data:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return hashlib.sha1(f"{method} {url}\n{post_data or ''}".encode('utf-8')).hexdigest()
+
+
+def search_key(query, num_results):
+    return f"{num_results}:{query}"
+
+
+def load_json(directory, name):
+    if not directory or not os.path.exists(os.path.join(directory, name)):
+        return {}
+    with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Corpus:
+    # Deterministic synthetic blog, JSE and Yahoo content for a given article count
+    def __init__(self, articles=100, instruments_per_article=5, seed=1, month=None):
+        rng = random.Random(seed)
+        month = month or datetime.now()
+        pool_size = max(20, articles * instruments_per_article // 3)
+        names = set()
+        while len(names) < pool_size:
+            names.add(' '.join(rng.sample(WORDS, 2) + [rng.choice(SUFFIXES)]))
+        self.instruments = []
+        for i, name in enumerate(sorted(names)):
+            self.instruments.append({
+                'name': name,
+                'code': f"Z{i:04d}",
+                'jse': rng.random() < 0.7,
+                'price': round(rng.uniform(100, 50000), 2),
+            })
+        self.by_code = {instrument['code']: instrument for instrument in self.instruments}
+        self.articles = []
+        for i in range(articles):
+            day = min(28, 1 + i * 28 // max(articles, 1))
+            mentioned = rng.sample(self.instruments, min(instruments_per_article, len(self.instruments)))
+            self.articles.append({
+                'slug': f"dividends-update-{i:05d}",
+                'date': month.replace(day=day).strftime('%B %d, %Y'),
+                'dividends': [(instrument, round(rng.uniform(1, 900), 2)) for instrument in mentioned],
+            })
+        self.articles.reverse()
+
+    def listing_page(self, page, fragment=False):
+        start = page * LISTING_PAGE_SIZE
+        chunk = self.articles[start:start + LISTING_PAGE_SIZE]
+        cards = ''.join(
+            f'<div class="post"><div class="post-date">{article["date"]}</div>'
+            f'<a class="LinkBox" href="https://{BLOG_HOST}/{article["slug"]}">{article["slug"]}</a></div>'
+            for article in chunk
+        )
+        more = '<a id="loadMore" href="#">Load more</a>' if start + LISTING_PAGE_SIZE < len(self.articles) else ''
+        if fragment:
+            return f"{cards}{more}"
+        return f'<html><body><div id="posts">{cards}{more}</div>{LOAD_MORE_SCRIPT}</body></html>'
+
+    def article_page(self, slug):
+        for article in self.articles:
+            if article['slug'] == slug:
+                paragraphs = ['<p>Here are the dividends declared this week.</p>']
+                for instrument, amount in article['dividends']:
+                    paragraphs.append(f"<p>{instrument['name']} will be paying {amount} cents per share.</p>")
+                    paragraphs.append('<p>Shareholders on the register will receive the payment.</p>')
+                return f"<html><body>{''.join(paragraphs)}</body></html>"
+        return None
+
+    def jse_result(self, instrument):
+        return (f'<div class="search-result search-result--instrument">'
+                f'<a href="/instruments/{instrument["code"]}">{instrument["name"]}</a>'
+                f'<div class="field--name-field-alpha-code"><span>{instrument["code"]}</span></div></div>')
+
+    def jse_search(self, keys, page):
+        listed = [instrument for instrument in self.instruments if instrument['jse']]
+        if not keys:
+            chunk = listed[page * JSE_LISTING_PAGE_SIZE:(page + 1) * JSE_LISTING_PAGE_SIZE]
+        else:
+            chunk = [instrument for instrument in listed if keys.lower() in instrument['name'].lower()][:5]
+        return f"<html><body>{''.join(self.jse_result(instrument) for instrument in chunk)}</body></html>"
+
+    def jse_instrument(self, code):
+        instrument = self.by_code.get(code)
+        if instrument is None:
+            return None
+        return (f'<html><body><div class="instrument-delta__price">Price {instrument["price"]:.2f}'
+                f'</div></body></html>')
+
+    def yahoo_quote(self, symbol):
+        digest = int(hashlib.sha1(symbol.encode('utf-8')).hexdigest()[:8], 16)
+        return {'symbol': symbol, 'price': round(10 + digest % 50000 / 100, 2), 'currency': 'USD', 'exchange': 'NYQ'}
+
+    def respond(self, host, path, query):
+        # (status, content type, body) for a request, or None when nothing matches
+        params = parse_qs(query)
+        if host == BLOG_HOST:
+            if path.startswith('/topic/'):
+                page = int(params.get('page', ['0'])[0])
+                return 200, 'text/html', self.listing_page(page, fragment='fragment' in params)
+            body = self.article_page(path.strip('/'))
+            return (200, 'text/html', body) if body else None
+        if host == JSE_HOST:
+            if path == '/search':
+                return 200, 'text/html', self.jse_search(params.get('keys', [''])[0], int(params.get('page', ['0'])[0]))
+            if path.startswith('/instruments/'):
+                body = self.jse_instrument(path.rsplit('/', 1)[-1])
+                return (200, 'text/html', body) if body else None
+        return None
+
+
+class ReplayServer:
+    def __init__(self, corpus=None, fixtures_dir=None, latency=(0, 0), rate_429=0.0, seed=1):
+        self.corpus = corpus
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def rewrite(self, url):
+        parts = urlsplit(url)
+        query = f"?{parts.query}" if parts.query else ''
+        return f"{self.base_url}/{parts.netloc}{parts.path or '/'}{query}"
+
+    def fixture(self, url, method='GET', post_data=None):
+        if not self.fixtures_dir:
+            return None
+        path = os.path.join(self.fixtures_dir, f"{fixture_key(url, method, post_data)}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data['status'], data.get('content_type', 'text/html'), data['body']
+
+    def lookup(self, url, method='GET', post_data=None):
+        # (status, content type, body) from a fixture, else the corpus, else None
+        result = self.fixture(url, method, post_data)
+        if result is None and self.corpus is not None:
+            parts = urlsplit(url)
+            result = self.corpus.respond(parts.netloc, parts.path, parts.query)
+        return result
+
+    def simulate(self, throttle=True):
+        # Counts one request and waits out its injected latency; True when it should get a 429
+        with self._lock:
+            self.requests += 1
+            delay = self._rng.uniform(*self.latency)
+            throttled = throttle and self._rng.random() < self.rate_429
+            if throttled:
+                self.throttled += 1
+        if delay:
+            time.sleep(delay)
+        return throttled
+
+    def handle(self, raw_path):
+        # Returns (status, headers, body bytes) for a rewritten request path
+        host, _, rest = raw_path.lstrip('/').partition('/')
+        parts = urlsplit(f"/{rest}")
+        if self.simulate():
+            return 429, {'Retry-After': '0', 'Content-Type': 'text/plain'}, b'Too Many Requests'
+        result = self.lookup(f"https://{host}{parts.path}" + (f"?{parts.query}" if parts.query else ''))
+        if result is None:
+            return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+        status, content_type, body = result
+        return status, {'Content-Type': content_type}, body.encode('utf-8')
+
+    async def route_page(self, page):
+        # scraper.page_hooks entry: answers the browser from fixtures and the corpus, and aborts
+        # everything else so nothing leaves the machine. Latency applies; 429s do not, since the
+        # scraper has no retry around page loads.
+        async def answer(route):
+            request = route.request
+            await asyncio.to_thread(self.simulate, False)
+            result = self.lookup(request.url, request.method, request.post_data)
+            if result is None:
+                await route.abort()
+                return
+            status, content_type, body = result
+            await route.fulfill(status=status, headers={'Content-Type': content_type}, body=body)
+
+        await page.route('**/*', answer)
+
+    def start(self, port=0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status, headers, body = server.handle(self.path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        self.stop()
+
+    def install(self):
+        if self._httpd is None:
+            self.start()
+        http_client.url_rewriter = self.rewrite
+
+    def uninstall(self):
+        if http_client.url_rewriter == self.rewrite:
+            http_client.url_rewriter = None
+
+
+class RecordingTicker:
+    # Wraps a yfinance Ticker, keeping the price and currency/exchange the scraper reads from it
+    def __init__(self, ticker, quote):
+        self._ticker = ticker
+        self._quote = quote
+
+    @property
+    def info(self):
+        info = self._ticker.info
+        self._quote.update(currency=info.get('currency'), exchange=info.get('exchange'))
+        return info
+
+    @property
+    def fast_info(self):
+        fast_info = self._ticker.fast_info
+        self._quote.update(currency=fast_info['currency'], exchange=fast_info['exchange'])
+        return fast_info
+
+    def history(self, **kwargs):
+        history = self._ticker.history(**kwargs)
+        if not history.empty:
+            self._quote['price'] = float(history['Close'].iloc[-1])
+        return history
+
+
+class RecordingYFinance:
+    # Wraps the yfinance module; quotes collects {symbol: {price, currency, exchange}}
+    def __init__(self, yf, quotes):
+        self._yf = yf
+        self._quotes = quotes
+
+    def download(self, symbols, **kwargs):
+        history = self._yf.download(symbols, **kwargs)
+        close = history['Close']
+        if close.ndim == 1:
+            close = close.to_frame(symbols if isinstance(symbols, str) else symbols[0])
+        if not close.empty:
+            for symbol, price in close.ffill().iloc[-1].dropna().items():
+                self._quotes.setdefault(symbol, {})['price'] = float(price)
+        return history
+
+    def Ticker(self, symbol):
+        return RecordingTicker(self._yf.Ticker(symbol), self._quotes.setdefault(symbol, {}))
+
+
+class Recorder:
+    # Saves what a live refresh receives at each client boundary: http_client and Playwright
+    # responses as URL fixtures, googlesearch results and yfinance quotes as call fixtures
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = fixtures_dir
+        self.searches = load_json(fixtures_dir, SEARCH_FIXTURES)
+        self.quotes = load_json(fixtures_dir, YFINANCE_FIXTURES)
+        self._replaced = None
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def save(self, url, status, content_type, body, method='GET', post_data=None):
+        data = {'url': url, 'method': method, 'post_data': post_data, 'status': status,
+                'content_type': content_type, 'body': body}
+        path = os.path.join(self.fixtures_dir, f"{fixture_key(url, method, post_data)}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def __call__(self, url, response):
+        self.save(response.url, response.status_code, response.headers.get('Content-Type', 'text/html'),
+                  response.text)
+
+    async def record_page(self, page):
+        # scraper.page_hooks entry: keeps the documents, scripts and XHRs the listing page loads
+        async def on_response(response):
+            request = response.request
+            if request.resource_type not in RECORDED_RESOURCE_TYPES:
+                return
+            try:
+                body = await response.text()
+            except Exception:
+                # Redirects have no body, and the page may close before late responses are read
+                return
+            self.save(response.url, response.status, response.headers.get('content-type', 'text/html'),
+                      body, request.method, request.post_data)
+
+        page.on('response', on_response)
+
+    def recording_search(self, search):
+        def recorded(query, num_results=10, **kwargs):
+            results = list(search(query, num_results=num_results, **kwargs))
+            self.searches[search_key(query, num_results)] = results
+            return iter(results)
+        return recorded
+
+    def __enter__(self):
+        import scraper
+        http_client.response_hooks.append(self)
+        self._replaced = (scraper.yf, scraper.search)
+        scraper.yf = RecordingYFinance(scraper.yf, self.quotes)
+        scraper.search = self.recording_search(scraper.search)
+        scraper.page_hooks.append(self.record_page)
+        return self
+
+    def __exit__(self, *exc):
+        import scraper
+        http_client.response_hooks.remove(self)
+        scraper.yf, scraper.search = self._replaced
+        scraper.page_hooks.remove(self.record_page)
+        for name, data in ((SEARCH_FIXTURES, self.searches), (YFINANCE_FIXTURES, self.quotes)):
+            with open(os.path.join(self.fixtures_dir, name), 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+
+
+class ReplayYFinance:
+    # Stand-in for the yfinance module: recorded quotes first, then the server's corpus.
+    # Each call counts as one request against the server's latency and 429 settings.
+    def __init__(self, server):
+        import pandas as pd
+        self.pd = pd
+        self.server = server
+        self.recorded = load_json(server.fixtures_dir, YFINANCE_FIXTURES)
+
+    def quotes(self, symbols):
+        if self.server.simulate():
+            raise Exception('429 Too Many Requests')
+        quotes = {}
+        for symbol in symbols:
+            quote = dict(self.server.corpus.yahoo_quote(symbol)) if self.server.corpus is not None else {}
+            quote.update(self.recorded.get(symbol, {}))
+            quotes[symbol] = quote
+        return quotes
+
+    def download(self, symbols, **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        quotes = self.quotes(symbols)
+        close = self.pd.DataFrame([[quotes[symbol].get('price') for symbol in symbols]], columns=symbols)
+        return self.pd.concat({'Close': close}, axis=1)
+
+    def Ticker(self, symbol):
+        replay = self
+
+        class Ticker:
+            @property
+            def info(self):
+                return replay.quotes([symbol])[symbol]
+
+            @property
+            def fast_info(self):
+                return self.info
+
+            def history(self, **kwargs):
+                price = self.info.get('price')
+                return replay.pd.DataFrame({'Close': [price] if price is not None else []})
+
+        return Ticker()
+
+
+class ReplaySearch:
+    # Stand-in for googlesearch.search: recorded results, or none for queries never recorded
+    def __init__(self, server):
+        self.server = server
+        self.recorded = load_json(server.fixtures_dir, SEARCH_FIXTURES)
+
+    def __call__(self, query, num_results=10, **kwargs):
+        if self.server.simulate():
+            raise Exception('429 Too Many Requests')
+        return iter(self.recorded.get(search_key(query, num_results), []))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help='run a live refresh and save every response as a fixture')
+    record.add_argument('fixtures_dir')
+    serve = sub.add_parser('serve', help='serve fixtures (and the synthetic corpus) until interrupted')
+    serve.add_argument('--fixtures')
+    serve.add_argument('--articles', type=int, default=100)
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--latency', type=float, default=0.0)
+    serve.add_argument('--rate-429', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from scraper import scrape_and_process_dividends
+        with Recorder(args.fixtures_dir):
+            scrape_and_process_dividends()
+        print(f"Recorded fixtures to {args.fixtures_dir}")
+    else:
+        server = ReplayServer(Corpus(args.articles), args.fixtures, (0, args.latency), args.rate_429).start(args.port)
+        print(f"Replay server on {server.base_url} (requests go to {server.base_url}/<host>/<path>)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
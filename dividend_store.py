@@ -0,0 +1,287 @@
+import os
+import csv
+import glob
+import time
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Monthly dividend snapshots; the newest snapshot of each month is kept as its history.
+# A refresh streams rows into an unpublished snapshot that readers do not see until publish().
+STORE_PATH = os.environ.get('DIVIDEND_STORE_PATH', os.path.join('data', 'dividends.sqlite3'))
+# Versioned CSV exports of published snapshots, one file per (month, snapshot)
+EXPORT_DIR = os.environ.get('DIVIDEND_EXPORT_DIR', os.path.join('data', 'exports'))
+
+CSV_COLUMNS = ["Region", "Instrument", "Symbol", "Dividend", "Price", "Article", "Source"]
+# Typed values computed by normalize.normalize_dividends
+TYPED_COLUMNS = {
+    "DividendAmount": ("dividend_amount", "REAL"),
+    "DividendCurrency": ("dividend_currency", "TEXT"),
+    "PriceAmount": ("price_amount", "REAL"),
+    "PriceCurrency": ("price_currency", "TEXT"),
+    "Yield": ("dividend_yield", "REAL"),
+}
+COLUMN_NAMES = {column: column.lower() for column in CSV_COLUMNS}
+COLUMN_NAMES.update({column: name for column, (name, _) in TYPED_COLUMNS.items()})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    month TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    row_count INTEGER NOT NULL,
+    published INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS snapshots_month ON snapshots (month, id);
+CREATE TABLE IF NOT EXISTS dividends (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    month TEXT NOT NULL,
+    region TEXT COLLATE NOCASE,
+    instrument TEXT,
+    symbol TEXT COLLATE NOCASE,
+    dividend TEXT,
+    price TEXT,
+    article TEXT,
+    source TEXT COLLATE NOCASE,
+    dividend_amount REAL,
+    dividend_currency TEXT,
+    price_amount REAL,
+    price_currency TEXT,
+    dividend_yield REAL
+);
+CREATE INDEX IF NOT EXISTS dividends_snapshot ON dividends (snapshot_id, region, instrument);
+CREATE INDEX IF NOT EXISTS dividends_month_region ON dividends (month, region);
+CREATE INDEX IF NOT EXISTS dividends_symbol_month ON dividends (symbol, month);
+CREATE INDEX IF NOT EXISTS dividends_article_month ON dividends (month, article);
+"""
+
+
+def current_month():
+    return datetime.now().strftime('%Y-%m')
+
+
+class DividendStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            existing = {row['name'] for row in self._conn.execute('PRAGMA table_info(dividends)')}
+            for name, sql_type in TYPED_COLUMNS.values():
+                if name not in existing:
+                    self._conn.execute(f'ALTER TABLE dividends ADD COLUMN {name} {sql_type}')
+            existing = {row['name'] for row in self._conn.execute('PRAGMA table_info(snapshots)')}
+            if 'published' not in existing:
+                self._conn.execute('ALTER TABLE snapshots ADD COLUMN published INTEGER NOT NULL DEFAULT 1')
+
+    @property
+    def _conn(self):
+        # One connection per process: workers forked from a preloaded app reconnect on first use
+        # instead of sharing the parent's SQLite handle
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._pid = os.getpid()
+        return self._connection
+
+    def write_snapshot(self, rows, month=None):
+        # Replaces the month's rows in one transaction so readers never see a partial snapshot
+        month = month or current_month()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO snapshots (month, created_at, row_count) VALUES (?, ?, ?)',
+                (month, time.time(), len(rows))
+            )
+            snapshot_id = cursor.lastrowid
+            self._insert_rows(snapshot_id, month, rows)
+            self._drop_older(snapshot_id, month)
+        logger.info(f"Stored snapshot {snapshot_id} for {month} with {len(rows)} rows")
+        return snapshot_id
+
+    def begin_snapshot(self, month=None):
+        # Starts an unpublished snapshot for append_rows(); leftovers of an interrupted refresh are dropped
+        month = month or current_month()
+        with self._lock, self._conn:
+            for row in self._conn.execute('SELECT id FROM snapshots WHERE published = 0').fetchall():
+                self._delete_snapshot(row['id'])
+            cursor = self._conn.execute(
+                'INSERT INTO snapshots (month, created_at, row_count, published) VALUES (?, ?, 0, 0)',
+                (month, time.time())
+            )
+        return cursor.lastrowid
+
+    def append_rows(self, snapshot_id, rows):
+        with self._lock, self._conn:
+            month = self._conn.execute('SELECT month FROM snapshots WHERE id = ?', (snapshot_id,)).fetchone()['month']
+            self._insert_rows(snapshot_id, month, rows)
+            self._conn.execute('UPDATE snapshots SET row_count = row_count + ? WHERE id = ?', (len(rows), snapshot_id))
+        return len(rows)
+
+    def publish(self, snapshot_id):
+        # Makes the snapshot visible and drops the month's older snapshots in one transaction
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT month, row_count FROM snapshots WHERE id = ?', (snapshot_id,)).fetchone()
+            self._conn.execute('UPDATE snapshots SET published = 1, created_at = ? WHERE id = ?',
+                               (time.time(), snapshot_id))
+            self._drop_older(snapshot_id, row['month'])
+        logger.info(f"Published snapshot {snapshot_id} for {row['month']} with {row['row_count']} rows")
+        return snapshot_id
+
+    def discard(self, snapshot_id):
+        with self._lock, self._conn:
+            self._delete_snapshot(snapshot_id)
+
+    def pending_snapshot(self):
+        # Id of the snapshot a refresh is currently appending to, or None
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(id) FROM snapshots WHERE published = 0').fetchone()
+        return row[0]
+
+    def snapshot_rows(self, snapshot_id, after=0):
+        # (last row id, rows appended after row id `after`), in insertion order; works while the snapshot is pending
+        select = ', '.join(f"{name} AS \"{column}\"" for column, name in COLUMN_NAMES.items())
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT id, {select} FROM dividends WHERE snapshot_id = ? AND id > ? ORDER BY id',
+                (snapshot_id, after)
+            ).fetchall()
+        if not rows:
+            return after, []
+        return rows[-1]['id'], [{key: row[key] for key in row.keys() if key != 'id'} for row in rows]
+
+    def _insert_rows(self, snapshot_id, month, rows):
+        self._conn.executemany(
+            f"INSERT INTO dividends (snapshot_id, month, {', '.join(COLUMN_NAMES.values())}) "
+            f"VALUES (?, ?, {', '.join('?' * len(COLUMN_NAMES))})",
+            [(snapshot_id, month) + tuple(row.get(column) for column in COLUMN_NAMES) for row in rows]
+        )
+
+    def _drop_older(self, snapshot_id, month):
+        self._conn.execute('DELETE FROM dividends WHERE month = ? AND snapshot_id < ?', (month, snapshot_id))
+        self._conn.execute('DELETE FROM snapshots WHERE month = ? AND id < ?', (month, snapshot_id))
+
+    def _delete_snapshot(self, snapshot_id):
+        self._conn.execute('DELETE FROM dividends WHERE snapshot_id = ?', (snapshot_id,))
+        self._conn.execute('DELETE FROM snapshots WHERE id = ?', (snapshot_id,))
+
+    def version(self):
+        # Changes whenever a snapshot is published; cheap enough to check per request
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(id) FROM snapshots WHERE published = 1').fetchone()
+        return row[0]
+
+    def snapshot_version(self, month):
+        # Id of the month's published snapshot; changes whenever the month is republished
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MAX(id) FROM snapshots WHERE published = 1 AND month = ?', (month,)
+            ).fetchone()
+        return row[0]
+
+    def latest_month(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT month FROM snapshots WHERE published = 1 ORDER BY id DESC LIMIT 1'
+            ).fetchone()
+        return row['month'] if row else None
+
+    def last_updated(self, month=None):
+        with self._lock:
+            if month:
+                row = self._conn.execute(
+                    'SELECT MAX(created_at) FROM snapshots WHERE published = 1 AND month = ?', (month,)
+                ).fetchone()
+            else:
+                row = self._conn.execute('SELECT MAX(created_at) FROM snapshots WHERE published = 1').fetchone()
+        return row[0]
+
+    def months(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT month FROM snapshots WHERE published = 1 ORDER BY month').fetchall()
+        return [row['month'] for row in rows]
+
+    def query(self, month=None, year=None, region=None, symbol=None, source=None, include_month=False,
+              snapshot_id=None):
+        # Filters take a value or a list of values (case-insensitive); rows come back keyed like the CSV
+        clauses, params = ['snapshot_id IN (SELECT id FROM snapshots WHERE published = 1)'], []
+        if snapshot_id:
+            clauses.append('snapshot_id = ?')
+            params.append(snapshot_id)
+        if month:
+            clauses.append('month = ?')
+            params.append(month)
+        elif year:
+            clauses.append('month BETWEEN ? AND ?')
+            params += [f"{year}-01", f"{year}-12"]
+        for column, value in (('region', region), ('symbol', symbol), ('source', source)):
+            if value:
+                values = [value] if isinstance(value, str) else list(value)
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params += values
+        where = f"WHERE {' AND '.join(clauses)}"
+        select = ', '.join(f"{name} AS \"{column}\"" for column, name in COLUMN_NAMES.items())
+        if include_month:
+            select += ', month AS "Month"'
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {select} FROM dividends {where} '
+                'ORDER BY month, region IS NULL, region, instrument IS NULL, instrument, id', params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def export_csv(self, file, month=None, **filters):
+        rows = self.query(month=month, include_month=month is None, **filters)
+        columns = list(COLUMN_NAMES) + (["Month"] if month is None else [])
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+        return len(rows)
+
+    def export_csv_file(self, month, directory=EXPORT_DIR):
+        # Path of a CSV holding exactly the month's current published snapshot. Each file is written
+        # once per snapshot to a temp file and renamed into place, so readers never see a partial file.
+        snapshot_id = self.snapshot_version(month)
+        if snapshot_id is None:
+            return None
+        path = os.path.join(directory, f"dividends-{month}-{snapshot_id}.csv")
+        if os.path.exists(path):
+            return path
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            self.export_csv(f, month, snapshot_id=snapshot_id)
+        os.replace(tmp_path, path)
+        for old_path in glob.glob(os.path.join(directory, f"dividends-{month}-*.csv")):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return path
+
+    def import_csv(self, path, month):
+        # One-off migration of a snapshot CSV written by earlier versions
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        return self.write_snapshot(rows, month)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DividendStore()
+        return _store
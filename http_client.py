@@ -0,0 +1,283 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+import urllib.error
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Concurrency and timeout settings for outbound fetches
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 8))
+PER_HOST_CONCURRENCY = int(os.environ.get('PER_HOST_CONCURRENCY', 4))
+CONNECT_TIMEOUT = float(os.environ.get('CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('READ_TIMEOUT', 20))
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+USER_AGENT = 'Mozilla/5.0 (compatible; dividend-flask-app)'
+
+# Steady-state requests per second per host; override with HOST_RATES="host=rate,host=rate"
+DEFAULT_HOST_RATE = float(os.environ.get('DEFAULT_HOST_RATE', 5))
+HOST_RATES = {
+    'www.google.com': 0.3,
+    'query1.finance.yahoo.com': 2,
+    'query2.finance.yahoo.com': 2,
+    'www.jse.co.za': 4,
+    'blogs.easyequities.co.za': 4,
+}
+HOST_RATES.update({
+    host.strip(): float(rate)
+    for host, rate in (pair.split('=') for pair in os.environ.get('HOST_RATES', '').split(',') if '=' in pair)
+})
+BURST = float(os.environ.get('RATE_LIMIT_BURST', 2))
+MIN_RATE_FRACTION = 0.05
+BACKOFF_SECONDS = float(os.environ.get('RATE_LIMIT_BACKOFF', 5))
+MAX_BACKOFF_SECONDS = float(os.environ.get('RATE_LIMIT_MAX_BACKOFF', 120))
+MAX_RETRIES = int(os.environ.get('MAX_RETRIES', 3))
+RETRY_BUDGET = int(os.environ.get('RETRY_BUDGET', 50))
+RETRY_STATUSES = {429, 503}
+
+YAHOO_HOST = 'query1.finance.yahoo.com'
+GOOGLE_HOST = 'www.google.com'
+
+
+class TokenBucket:
+    # Per-host token bucket whose rate halves on 429s and creeps back up on successes
+    def __init__(self, rate, burst=BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.strikes = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # Takes a token and returns how long the caller must wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            return max(wait, self.blocked_until - now)
+
+    def penalize(self, retry_after=None):
+        with self._lock:
+            self.strikes += 1
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            delay = retry_after if retry_after is not None else BACKOFF_SECONDS * 2 ** (self.strikes - 1)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + min(delay, MAX_BACKOFF_SECONDS))
+            return delay
+
+    def reward(self):
+        with self._lock:
+            self.strikes = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+
+class RateLimiter:
+    # Shared by threads and asyncio tasks: acquire() sleeps, acquire_async() awaits
+    def __init__(self, rates=None, default_rate=DEFAULT_HOST_RATE):
+        self.rates = HOST_RATES if rates is None else rates
+        self.default_rate = default_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rates.get(host, self.default_rate))
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, host):
+        wait = self.bucket(host).reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, host):
+        wait = self.bucket(host).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, host, retry_after=None):
+        delay = self.bucket(host).penalize(retry_after)
+        logger.warning(f"Rate limited by {host}, backing off {delay:.1f}s")
+        return delay
+
+    def reward(self, host):
+        self.bucket(host).reward()
+
+
+class RetryBudget:
+    # Caps retries across a whole refresh so one throttled host cannot stall the run
+    def __init__(self, total=RETRY_BUDGET):
+        self.total = total
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def reset(self, total=None):
+        with self._lock:
+            self.total = self.total if total is None else total
+            self.remaining = self.total
+
+    def try_consume(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+limiter = RateLimiter()
+retry_budget = RetryBudget()
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error):
+    # yfinance's rate-limit exception, an HTTP error for a 429 response, or the 429 reason phrase;
+    # a bare "429" elsewhere in a message (a price, a symbol, a timestamp) does not count
+    if type(error).__name__ == 'YFRateLimitError':
+        return True
+    if getattr(getattr(error, 'response', None), 'status_code', None) == 429:
+        return True
+    if isinstance(error, urllib.error.HTTPError) and error.code == 429:
+        return True
+    return 'too many requests' in str(error).lower()
+
+
+def call_with_retries(host, func, retries=MAX_RETRIES):
+    # For clients we cannot route through fetch() (yfinance, googlesearch):
+    # rate-limit the call and retry rate-limit errors within the shared budget
+    for attempt in range(retries + 1):
+        limiter.acquire(host)
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - started, host)
+            rate_limited = is_rate_limit_error(e)
+            metrics.HTTP_REQUESTS.inc(host, '429' if rate_limited else 'error')
+            if rate_limited and attempt < retries and retry_budget.try_consume():
+                metrics.HTTP_RETRIES.inc(host)
+                limiter.penalize(host)
+                continue
+            raise
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, host)
+        metrics.HTTP_REQUESTS.inc(host, 'ok')
+        limiter.reward(host)
+        return result
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+# Test/benchmark hooks: url_rewriter(url) -> url actually requested (rate limits still key on
+# the original host); response_hooks are called with (url, response) after every fetch
+url_rewriter = None
+response_hooks = []
+
+
+def get_session():
+    # One keep-alive session shared by every fetcher so connections are reused
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            pool_size = max(FETCH_WORKERS, PER_HOST_CONCURRENCY)
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'User-Agent': USER_AGENT})
+            _session = session
+        return _session
+
+
+def _host_semaphore(host):
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(PER_HOST_CONCURRENCY)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+
+@contextmanager
+def host_slot(url):
+    semaphore = _host_semaphore(urlparse(url).netloc)
+    with semaphore:
+        yield
+
+
+def fetch(url, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, **kwargs):
+    host = urlparse(url).netloc
+    for attempt in range(retries + 1):
+        limiter.acquire(host)
+        with host_slot(url):
+            target = url_rewriter(url) if url_rewriter else url
+            started = time.perf_counter()
+            try:
+                response = get_session().get(target, timeout=timeout, **kwargs)
+            except Exception:
+                metrics.HTTP_REQUESTS.inc(host, 'error')
+                raise
+            finally:
+                metrics.HTTP_LATENCY.observe(time.perf_counter() - started, host)
+        metrics.HTTP_REQUESTS.inc(host, str(response.status_code))
+        for hook in response_hooks:
+            hook(url, response)
+        if response.status_code not in RETRY_STATUSES:
+            limiter.reward(host)
+            return response
+        limiter.penalize(host, parse_retry_after(response.headers.get('Retry-After')))
+        if attempt == retries or not retry_budget.try_consume():
+            break
+        metrics.HTTP_RETRIES.inc(host)
+    logger.warning(f"Giving up on {url} after {attempt + 1} attempts (HTTP {response.status_code})")
+    return response
+
+
+def fetch_all(urls, max_workers=FETCH_WORKERS, timeout=REQUEST_TIMEOUT, headers_for=None):
+    # Returns (response, error) pairs in the same order as urls;
+    # headers_for(url) can add per-request headers such as conditional GET validators
+    def fetch_one(url):
+        try:
+            headers = headers_for(url) if headers_for else None
+            return fetch(url, timeout=timeout, headers=headers), None
+        except Exception as e:
+            logger.warning(f"Error fetching {url}: {e}")
+            return None, e
+
+    urls = list(urls)
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        return list(pool.map(fetch_one, urls))
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 20
+# Lock file shared by every worker process; whoever holds it is the one refreshing
+LEASE_PATH = os.environ.get('REFRESH_LEASE_PATH', os.path.join('data', 'refresh.lock'))
+# Job status shared by every worker process, so /refresh/<id> answers wherever the request lands
+JOBS_PATH = os.environ.get('REFRESH_JOBS_PATH', os.path.join('data', 'jobs.sqlite3'))
+# Progress within a stage is written to the job store at most this often; stage changes always are
+JOB_SAVE_INTERVAL = float(os.environ.get('JOB_SAVE_INTERVAL', 1.0))
+# After a failed refresh, automatic refreshes wait RETRY_BACKOFF seconds, doubling with every
+# further failure up to RETRY_BACKOFF_MAX
+RETRY_BACKOFF = int(os.environ.get('REFRESH_RETRY_BACKOFF', 60))
+RETRY_BACKOFF_MAX = int(os.environ.get('REFRESH_RETRY_BACKOFF_MAX', 3600))
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+"""
+
+
+class RefreshJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.stage = None
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def update(self, stage, done=None, total=None):
+        # Progress callback handed to scrape_and_process_dividends
+        if stage != self.stage:
+            logger.info(f"Refresh job {self.id}: {stage}")
+            self.done, self.total = 0, None
+        self.stage = stage
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls.__new__(cls)
+        job.id = data['id']
+        for name in ('status', 'stage', 'done', 'total', 'error', 'created_at', 'started_at', 'finished_at'):
+            setattr(job, name, data[name])
+        return job
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'progress': round(self.done / self.total, 3) if self.total else None,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobStore:
+    # SQLite copy of every worker's jobs; the worker running a job is the only one writing it
+    def __init__(self, path=JOBS_PATH, keep=MAX_FINISHED_JOBS):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(JOBS_SCHEMA)
+
+    @property
+    def _conn(self):
+        # One connection per process, as in DividendStore
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._pid = os.getpid()
+        return self._connection
+
+    def save(self, job):
+        data = job.to_dict()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, pid, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)',
+                (job.id, os.getpid(), job.created_at, time.time(), json.dumps(data))
+            )
+            if job.finished:
+                self._conn.execute(
+                    'DELETE FROM jobs WHERE id NOT IN (SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)',
+                    (self.keep,)
+                )
+
+    def load(self, job_id):
+        # Job as its worker last saved it; an unfinished job whose worker is gone is reported failed
+        with self._lock:
+            row = self._conn.execute('SELECT pid, data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = RefreshJob.from_dict(json.loads(row['data']))
+        if not job.finished and not _pid_alive(row['pid']):
+            job.status = 'failed'
+            job.error = 'The worker running this refresh exited'
+        return job
+
+
+class JobRunner:
+    # Runs target(progress) in a background thread; concurrent submits join the in-flight job.
+    # With a JobStore, jobs started in other worker processes can be looked up too.
+    def __init__(self, target, store=None):
+        self.target = target
+        self.store = store
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._current = None
+        self._scheduler = None
+        self._failures = 0
+        self._retry_at = 0
+
+    def submit(self):
+        with self._lock:
+            if self._current is not None and not self._current.finished:
+                return self._current, False
+            job = RefreshJob()
+            self._jobs[job.id] = job
+            self._current = job
+            self._prune()
+        self._save(job)
+        threading.Thread(target=self._run, args=(job,), name=f"refresh-{job.id[:8]}", daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        # Jobs of other workers are read-only copies loaded from the store
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            try:
+                job = self.store.load(job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read refresh job {job_id}: {e}")
+        return job
+
+    @property
+    def current(self):
+        with self._lock:
+            return self._current
+
+    @property
+    def backing_off(self):
+        # True while automatic refreshes should not be submitted after recent failures
+        with self._lock:
+            return time.time() < self._retry_at
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started_at = time.time()
+        self._save(job)
+        last_saved = [job.stage, time.monotonic()]
+
+        def progress(stage, done=None, total=None):
+            job.update(stage, done, total)
+            if stage != last_saved[0] or time.monotonic() - last_saved[1] >= JOB_SAVE_INTERVAL:
+                last_saved[:] = [stage, time.monotonic()]
+                self._save(job)
+
+        try:
+            self.target(progress)
+            job.status = 'succeeded'
+        except Exception as e:
+            logger.exception(f"Refresh job {job.id} failed")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            self._record_outcome(job)
+
+    def _record_outcome(self, job):
+        with self._lock:
+            if job.status == 'succeeded':
+                self._failures, self._retry_at = 0, 0
+                return
+            self._failures += 1
+            delay = min(RETRY_BACKOFF * 2 ** (self._failures - 1), RETRY_BACKOFF_MAX)
+            self._retry_at = job.finished_at + delay
+        logger.warning(f"Refresh failed {self._failures} time(s) in a row; "
+                       f"automatic refreshes resume in {delay}s")
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not save refresh job {job.id}: {e}")
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in sorted(finished, key=lambda job: job.created_at)[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job.id]
+
+    def start_schedule(self, is_stale, check_interval=60):
+        # Keeps the snapshot warm: submits a refresh whenever is_stale() says so, except while
+        # backing off after failed refreshes
+        def loop():
+            while True:
+                try:
+                    if not self.backing_off and is_stale():
+                        job, started = self.submit()
+                        if started:
+                            logger.info(f"Scheduled refresh started: job {job.id}")
+                except Exception as e:
+                    logger.error(f"Refresh scheduler error: {e}")
+                time.sleep(check_interval)
+
+        # Safe to call on every request: after a fork the inherited thread is not alive and a new one starts
+        with self._lock:
+            if self._scheduler is None or not self._scheduler.is_alive():
+                self._scheduler = threading.Thread(target=loop, name='refresh-scheduler', daemon=True)
+                self._scheduler.start()
+
+
+class FileLease:
+    # Inter-process lease on a lock file (flock). The OS drops the lock when its holder exits or
+    # crashes, so a dead worker never blocks later refreshes. Without fcntl (Windows) every
+    # try_acquire() in a process that does not already hold the lease succeeds.
+    def __init__(self, path=LEASE_PATH):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self._file is not None:
+                return False
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            lock_file = open(self.path, 'a+', encoding='utf-8')
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    return False
+            # Holder's pid, for whoever inspects the lock file
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(f"{os.getpid()} {time.time():.0f}\n")
+            lock_file.flush()
+            self._file = lock_file
+            return True
+
+    def release(self):
+        with self._lock:
+            if self._file is None:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def wait(self, timeout=None, poll_interval=1.0):
+        # Blocks until no process holds the lease; False if it is still held after timeout seconds
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        self.release()
+        return True
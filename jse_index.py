@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import Counter
+
+from names import match_tokens
+
+logger = logging.getLogger(__name__)
+
+JSE_BASE_URL = "https://www.jse.co.za"
+INDEX_PATH = os.environ.get('JSE_INDEX_PATH', os.path.join('data', 'jse_instruments.json'))
+# Listing pages are walked with ?page=N until an empty page comes back
+LISTING_URL = os.environ.get('JSE_LISTING_URL', f"{JSE_BASE_URL}/search?keys=&type=instrument")
+INDEX_MAX_AGE = int(os.environ.get('JSE_INDEX_MAX_AGE', 7 * 24 * 3600))
+# After a walk that stopped on a failed page, the next attempt waits this long instead of every run
+INDEX_RETRY_AFTER = int(os.environ.get('JSE_INDEX_RETRY_AFTER', 3600))
+MATCH_THRESHOLD = float(os.environ.get('JSE_MATCH_THRESHOLD', 0.85))
+# The best match must also beat the runner-up by this much, or the name is treated as ambiguous
+MATCH_MARGIN = float(os.environ.get('JSE_MATCH_MARGIN', 0.1))
+MAX_LISTING_PAGES = int(os.environ.get('JSE_MAX_LISTING_PAGES', 200))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class JSEIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.refreshed_at = 0
+        self.retry_at = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._entries = []
+        self._by_code = {}
+        self._by_name = {}
+        self._shared_names = {}
+        self._by_prefix = {}
+        self._postings = {}
+        self._features = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            return self
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self._lock:
+            for entry in data.get('instruments', []):
+                self._add(entry['name'], entry['code'], entry['url'])
+            self.refreshed_at = data.get('refreshed_at', 0)
+            self.retry_at = data.get('retry_at', 0)
+            self.dirty = False
+        logger.info(f"Loaded {len(self._entries)} JSE instruments from {path}")
+        return self
+
+    def save(self, path=None):
+        path = path or self.path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            data = {'refreshed_at': self.refreshed_at, 'retry_at': self.retry_at, 'instruments': list(self._entries)}
+            self.dirty = False
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def is_stale(self, max_age=INDEX_MAX_AGE):
+        now = time.time()
+        return now - self.refreshed_at > max_age and now >= self.retry_at
+
+    def add(self, name, code, url):
+        with self._lock:
+            if self._add(name, code, url):
+                self.dirty = True
+
+    def _add(self, name, code, url):
+        if not name or not code or code == 'N/A' or code.upper() in self._by_code:
+            return False
+        tokens = match_tokens(name)
+        key = ' '.join(tokens)
+        if not key:
+            return False
+        entry_id = len(self._entries)
+        self._entries.append({'name': name, 'code': code, 'url': url})
+        self._by_code[code.upper()] = entry_id
+        if key in self._by_name:
+            # Different instruments whose names clean to the same tokens: an exact hit is ambiguous
+            self._shared_names.setdefault(key, [self._by_name[key]]).append(entry_id)
+        else:
+            self._by_name[key] = entry_id
+        for i in range(1, len(tokens)):
+            # Up to two longer names per leading-word prefix are enough to tell a truncation is ambiguous
+            longer = self._by_prefix.setdefault(' '.join(tokens[:i]), [])
+            if len(longer) < 2:
+                longer.append(entry_id)
+        grams = trigrams(key)
+        self._features.append((set(tokens), len(grams)))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(entry_id)
+        return True
+
+    def match(self, name, limit=1):
+        # Best entries for name as [(entry, score)], score in [0, 1]
+        tokens = match_tokens(name)
+        key = ' '.join(tokens)
+        if not key:
+            return []
+        with self._lock:
+            # A name that is the leading words of longer listed names may be any of them
+            scores = {entry_id: 1.0 for entry_id in self._by_prefix.get(key, ())}
+            if key in self._shared_names:
+                scores.update((entry_id, 1.0) for entry_id in self._shared_names[key])
+            else:
+                exact = self._by_name.get(key)
+                if exact is None:
+                    exact = self._by_code.get(name.strip().upper())
+                if exact is not None:
+                    scores[exact] = 1.0
+
+            if not scores:
+                grams = trigrams(key)
+                shared = Counter()
+                for gram in grams:
+                    shared.update(self._postings.get(gram, ()))
+                query_tokens = set(tokens)
+                for entry_id, overlap in shared.most_common(max(limit * 10, 20)):
+                    entry_tokens, entry_grams = self._features[entry_id]
+                    dice = 2 * overlap / (len(grams) + entry_grams)
+                    jaccard = len(query_tokens & entry_tokens) / len(query_tokens | entry_tokens)
+                    scores[entry_id] = 0.6 * dice + 0.4 * jaccard
+            scored = sorted(((self._entries[entry_id], score) for entry_id, score in scores.items()),
+                            key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def best_match(self, name, threshold=MATCH_THRESHOLD, margin=MATCH_MARGIN):
+        # (entry, score) only for a confident, unambiguous match; otherwise (None, best score)
+        matches = self.match(name, limit=2)
+        if not matches:
+            return None, 0.0
+        runner_up = matches[1][1] if len(matches) > 1 else 0.0
+        if matches[0][1] >= threshold and matches[0][1] - runner_up >= margin:
+            return matches[0]
+        return None, matches[0][1]
+
+    def refresh(self, fetch, listing_url=LISTING_URL, max_pages=MAX_LISTING_PAGES):
+        # fetch(url) -> response; parsed with the same selectors as the JSE search page. A failed or
+        # non-OK page ends the walk without marking the index fresh; what was added is kept and the
+        # walk is retried after INDEX_RETRY_AFTER.
+        from bs4 import BeautifulSoup
+
+        added = 0
+        for page in range(max_pages):
+            try:
+                response = fetch(f"{listing_url}&page={page}")
+                if not response.ok:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                soup = BeautifulSoup(response.text, 'html.parser')
+            except Exception as e:
+                logger.error(f"Error fetching JSE listing page {page}: {e}")
+                self.retry_at = time.time() + INDEX_RETRY_AFTER
+                self.dirty = True
+                logger.info(f"JSE index refresh stopped at page {page}: {added} new instruments, "
+                            f"retrying in {INDEX_RETRY_AFTER} s")
+                return added
+            results = soup.find_all('div', class_='search-result search-result--instrument')
+            if not results:
+                break
+            for result in results:
+                link_tag = result.find('a')
+                symbol_tag = result.find('div', class_='field--name-field-alpha-code')
+                if not link_tag or not symbol_tag:
+                    continue
+                before = len(self)
+                self.add(link_tag.text.strip(), symbol_tag.find('span').text.strip(),
+                         f"{JSE_BASE_URL}{link_tag['href']}")
+                added += len(self) - before
+        self.refreshed_at = time.time()
+        self.retry_at = 0
+        self.dirty = True
+        logger.info(f"Refreshed JSE index: {added} new instruments, {len(self)} total")
+        return added
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = JSEIndex().load()
+        return _index
@@ -0,0 +1,368 @@
+import os
+import glob
+import json
+import time
+import atexit
+import threading
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Summary of the last refresh, shared with the other workers through a file
+LAST_REFRESH_PATH = os.environ.get('LAST_REFRESH_PATH', os.path.join('data', 'last_refresh.json'))
+# When set, every refresh also writes a JSON profile of its stages and requests here
+PROFILE_DIR = os.environ.get('METRICS_PROFILE_DIR')
+# Every app worker writes its counters to {pid}-{start ns}.json here (at most every
+# METRICS_FLUSH_INTERVAL seconds) and exited workers are folded into archived.json; /metrics sums
+# all of them, so it reports the same totals whichever worker answers
+SHARED_DIR = os.environ.get('METRICS_SHARED_DIR', os.path.join('data', 'metrics'))
+ARCHIVE_NAME = 'archived'
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STAGE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def reset(self):
+        # Only called in a freshly forked child, where another thread may have held the old lock
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self, shared=()):
+        # shared: (labels, value) pairs written by other processes, summed with this one's
+        totals = {}
+        for labels, value in self.items() + [(tuple(labels), value) for labels, value in shared]:
+            totals[labels] = self._add(totals[labels], value) if labels in totals else value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(totals.items()):
+            lines += self._render_value(labels, value)
+        return lines
+
+    def _add(self, value, other):
+        return value + other
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {value}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+        maybe_flush()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts, total, count = self._values.get(labels, ([0] * len(self.buckets), 0.0, 0))
+            counts = [c + (value <= bound) for c, bound in zip(counts, self.buckets)]
+            self._values[labels] = (counts, total + value, count + 1)
+        maybe_flush()
+
+    def _add(self, value, other):
+        return ([a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2])
+
+    def _render_value(self, labels, value):
+        counts, total, count = value
+        lines = [
+            f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', bound)])} {bucket_count}"
+            for bound, bucket_count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+HTTP_REQUESTS = Counter('dividend_http_requests_total', 'Outbound requests by host and status', ['host', 'status'])
+HTTP_LATENCY = Histogram('dividend_http_request_duration_seconds', 'Outbound request latency', ['host'])
+HTTP_RETRIES = Counter('dividend_http_retries_total', 'Retries after rate limiting', ['host'])
+CACHE_LOOKUPS = Counter('dividend_cache_lookups_total', 'Resolution and price cache lookups', ['cache', 'result'])
+STAGE_DURATION = Histogram('dividend_stage_duration_seconds', 'Refresh stage duration', ['stage'],
+                           buckets=STAGE_BUCKETS)
+REFRESHES = Counter('dividend_refreshes_total', 'Completed refreshes by outcome', ['outcome'])
+
+
+class RunProfile:
+    # Stage timings and request counts for one refresh
+    def __init__(self):
+        self.started_at = time.time()
+        self.stages = {}
+        self._requests_before = dict(HTTP_REQUESTS._values)
+        self._started = time.perf_counter()
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+
+    def finish(self, rows, outcome):
+        duration = time.perf_counter() - self._started
+        requests = {}
+        for (host, status), count in dict(HTTP_REQUESTS._values).items():
+            delta = count - self._requests_before.get((host, status), 0)
+            if delta:
+                requests.setdefault(host, {})[status] = delta
+        return {
+            'started_at': self.started_at,
+            'finished_at': time.time(),
+            'duration_seconds': round(duration, 3),
+            'outcome': outcome,
+            'rows': rows,
+            'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            'requests': requests,
+        }
+
+
+_run = threading.local()
+
+
+@contextmanager
+def stage(name):
+    # Inside a run, streamed stages enter many times; their totals are observed once in finish_run
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        profile = getattr(_run, 'profile', None)
+        if profile is not None:
+            profile.add_stage(name, elapsed)
+        else:
+            STAGE_DURATION.observe(elapsed, name)
+
+
+def start_run():
+    _run.profile = RunProfile()
+    return _run.profile
+
+
+def finish_run(rows=0, outcome='success'):
+    profile = getattr(_run, 'profile', None)
+    if profile is None:
+        return None
+    _run.profile = None
+    summary = profile.finish(rows, outcome)
+    for name, seconds in profile.stages.items():
+        STAGE_DURATION.observe(seconds, name)
+    REFRESHES.inc(outcome)
+    flush()
+    write_json(LAST_REFRESH_PATH, summary)
+    if PROFILE_DIR:
+        write_json(os.path.join(PROFILE_DIR, f"refresh-{int(summary['started_at'])}.json"), summary)
+    return summary
+
+
+def write_json(path, data):
+    try:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics file {path}: {e}")
+
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+# Set by start_sharing() in processes that serve requests; scripts, benchmarks and the gunicorn
+# --preload master never write to SHARED_DIR
+_worker_id = None
+
+
+def start_sharing():
+    # Called on every request; the first gives this worker an id that stays unique across pid reuse
+    global _worker_id
+    with _flush_lock:
+        if _worker_id is None:
+            _worker_id = f"{os.getpid()}-{time.time_ns()}"
+
+
+def shared_path(worker_id):
+    return os.path.join(SHARED_DIR, f"{worker_id}.json")
+
+
+def flush():
+    # Writes this worker's counters to its file in SHARED_DIR
+    global _last_flush
+    with _flush_lock:
+        _last_flush = time.monotonic()
+        if _worker_id is not None:
+            write_json(shared_path(_worker_id), {metric.name: metric.items() for metric in REGISTRY})
+
+
+def maybe_flush():
+    if _worker_id is not None and time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _worker_files():
+    # {worker id: path} for every worker file; the id starts with the worker's pid
+    files = {}
+    for path in glob.glob(os.path.join(SHARED_DIR, '*.json')):
+        worker_id = os.path.basename(path)[:-len('.json')]
+        if worker_id != ARCHIVE_NAME:
+            files[worker_id] = path
+    return files
+
+
+def _archive_dead(files):
+    # Folds the files of exited workers into the archived totals and removes them, so the directory
+    # holds one file per live worker. Ids are remembered until their file is gone, so a crash between
+    # writing the archive and removing a file never counts it twice.
+    archive_path = shared_path(ARCHIVE_NAME)
+    archive = _read_json(archive_path) or {'folded': [], 'metrics': {}}
+    folded = set(archive['folded'])
+    dead = {}
+    for worker_id, path in files.items():
+        try:
+            pid = int(worker_id.split('-')[0])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            dead[worker_id] = path
+    if not dead:
+        return files
+    by_name = {metric.name: metric for metric in REGISTRY}
+    totals = {name: {tuple(labels): value for labels, value in items}
+              for name, items in archive['metrics'].items()}
+    for worker_id, path in dead.items():
+        if worker_id in folded:
+            continue
+        for name, items in (_read_json(path) or {}).items():
+            merged = totals.setdefault(name, {})
+            add = by_name[name]._add if name in by_name else (lambda value, other: value + other)
+            for labels, value in items:
+                labels = tuple(labels)
+                merged[labels] = add(merged[labels], value) if labels in merged else value
+        folded.add(worker_id)
+    write_json(archive_path, {
+        'folded': sorted(worker_id for worker_id in folded if worker_id in files),
+        'metrics': {name: [(list(labels), value) for labels, value in merged.items()]
+                    for name, merged in totals.items()},
+    })
+    for path in dead.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return {worker_id: path for worker_id, path in files.items() if worker_id not in dead}
+
+
+def read_shared():
+    # {metric name: [(labels, value), ...]} from the archived totals of exited workers and the files
+    # of the other live ones, so totals keep counting up across worker restarts
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    with open(os.path.join(SHARED_DIR, '.lock'), 'a+', encoding='utf-8') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        files = _archive_dead(_worker_files())
+        sources = [(_read_json(shared_path(ARCHIVE_NAME)) or {}).get('metrics', {})]
+        sources += [_read_json(path) or {} for worker_id, path in files.items() if worker_id != _worker_id]
+    shared = {}
+    for data in sources:
+        for name, items in data.items():
+            shared.setdefault(name, []).extend(items)
+    return shared
+
+
+def _reset_after_fork():
+    # A forked worker starts from zero with no id of its own; what it inherited stays with the parent
+    global _last_flush, _flush_lock, _worker_id
+    _last_flush = 0.0
+    _flush_lock = threading.Lock()
+    _worker_id = None
+    for metric in REGISTRY:
+        metric.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush)
+
+
+def render():
+    # Prometheus text exposition of every process's metrics plus the last refresh summary
+    lines = []
+    shared = read_shared()
+    for metric in REGISTRY:
+        lines += metric.render(shared.get(metric.name, ()))
+    try:
+        with open(LAST_REFRESH_PATH, 'r', encoding='utf-8') as f:
+            last = json.load(f)
+    except (OSError, ValueError):
+        last = None
+    if last:
+        gauges = [
+            ('dividend_last_refresh_duration_seconds', 'Duration of the last refresh', last['duration_seconds']),
+            ('dividend_last_refresh_rows', 'Rows written by the last refresh', last['rows']),
+            ('dividend_last_refresh_timestamp_seconds', 'When the last refresh finished', last['finished_at']),
+            ('dividend_last_refresh_success', '1 if the last refresh succeeded', int(last['outcome'] == 'success')),
+        ]
+        for name, help, value in gauges:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        name = 'dividend_last_refresh_stage_seconds'
+        lines += [f"# HELP {name} Stage durations of the last refresh", f"# TYPE {name} gauge"]
+        lines += [f'{name}{{stage="{_escape(stage_name)}"}} {seconds}' for stage_name, seconds in last['stages'].items()]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,30 @@
+import re
+
+EXCLUDED_KEYWORDS = ['tariff', 'investor sentiment', 'bear market']
+CORPORATE_SUFFIXES = re.compile(r'\b(Limited|Corporation|Incorporated|PLC|SE|Group)\b', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+# Abbreviations JSE uses in instrument names, folded to one spelling for matching
+MATCH_REPLACEMENTS = {
+    'ltd': '', 'limited': '', 'holdings': 'hldgs', 'property': 'prop', 'properties': 'prop',
+    'funding': 'fund', 'financial': 'fin', 'services': 'serv', 'investments': 'inv',
+    'international': 'intl', 'and': '', 'the': '', 'eft': '',
+}
+NON_ALNUM = re.compile(r'[^a-z0-9 ]+')
+
+
+def clean_instrument_name(name):
+    name = name.strip()
+    if len(name) > 100 or any(keyword in name.lower() for keyword in EXCLUDED_KEYWORDS):
+        return None
+    name = CORPORATE_SUFFIXES.sub('', name)
+    name = WHITESPACE.sub(' ', name).strip()
+    return name if name else None
+
+
+def match_tokens(name):
+    # Same cleaning as article extraction, then lowercase tokens with abbreviations folded
+    cleaned = clean_instrument_name(name) or ''
+    tokens = NON_ALNUM.sub(' ', cleaned.lower()).split()
+    tokens = [MATCH_REPLACEMENTS.get(token, token) for token in tokens]
+    return [token for token in tokens if token]
@@ -0,0 +1,74 @@
+import pandas as pd
+
+# Typed columns derived from the free-text Dividend and Price columns
+TYPED_COLUMNS = ["DividendAmount", "DividendCurrency", "PriceAmount", "PriceCurrency", "Yield"]
+
+AMOUNT_PATTERN = r'(\d[\d\s,]*(?:\.\d+)?)'
+# (pattern, currency, divisor to major units); first match wins. Currency None means cents of
+# the row's region currency (US companies also announce "24 cents per share"), ZAR when unknown
+DIVIDEND_CURRENCY_PATTERNS = [
+    (r'\bus\s*cents?\b|\busc\b', 'USD', 100),
+    (r'\bzac\b', 'ZAR', 100),
+    (r'\bcents?\b|\d\s*c\b', None, 100),
+    (r'\bpence\b|\bgbx\b|\d\s*p\b', 'GBP', 100),
+    (r'\busd\b|\$', 'USD', 1),
+    (r'\beur\b|€', 'EUR', 1),
+    (r'\bgbp\b|£', 'GBP', 1),
+    (r'\bzar\b|\brand\b|\br\s?\d', 'ZAR', 1),
+]
+REGION_CURRENCIES = {'USA': 'USD', 'EUR': 'EUR'}
+
+
+def parse_amounts(text):
+    # First number in each string as float64, tolerating "1 234" / "1,234" thousands separators
+    amounts = text.str.extract(AMOUNT_PATTERN, expand=False)
+    amounts = amounts.str.replace(r'[\s,]', '', regex=True)
+    return pd.to_numeric(amounts, errors='coerce')
+
+
+def parse_dividends(dividend, region=None):
+    text = dividend.astype(str).str.lower()
+    amount = parse_amounts(text)
+    currency = pd.Series(None, index=dividend.index, dtype=object)
+    divisor = pd.Series(1.0, index=dividend.index)
+    region = pd.Series(None, index=dividend.index, dtype=object) if region is None else region.astype(object)
+    region_currency = region.map(REGION_CURRENCIES).fillna('ZAR')
+    for pattern, code, scale in DIVIDEND_CURRENCY_PATTERNS:
+        hit = currency.isna() & text.str.contains(pattern, regex=True, na=False)
+        currency = currency.mask(hit, region_currency if code is None else code)
+        divisor = divisor.mask(hit, scale)
+    return amount / divisor, currency
+
+
+def parse_prices(price, symbol, region, source):
+    amount = parse_amounts(price.astype(str))
+    # "0.00" is the scrapers' "no price" sentinel
+    amount = amount.mask(amount <= 0)
+    symbol = symbol.astype(str).str.upper()
+    # JSE quotes (and yfinance .JO tickers) are in cents
+    in_cents = source.isin(['JSE', 'Manual Mapping']) | symbol.str.endswith('.JO')
+    currency = pd.Series(None, index=price.index, dtype=object)
+    currency = currency.mask(in_cents | (region == 'SA'), 'ZAR')
+    currency = currency.fillna(region.map(REGION_CURRENCIES))
+    return amount.where(~in_cents, amount / 100), currency
+
+
+def normalize_dividends(df):
+    # Adds typed amount/currency/yield columns, vectorized over the whole frame; amounts stay float64
+    # so stored and served values are exact
+    df = df.copy()
+    dividend_amount, dividend_currency = parse_dividends(df["Dividend"], df["Region"])
+    price_amount, price_currency = parse_prices(df["Price"], df["Symbol"], df["Region"], df["Source"])
+
+    same_currency = dividend_currency.notna() & (dividend_currency == price_currency)
+    df["DividendAmount"] = dividend_amount
+    df["DividendCurrency"] = dividend_currency
+    df["PriceAmount"] = price_amount
+    df["PriceCurrency"] = price_currency
+    df["Yield"] = (dividend_amount / price_amount).where(same_currency)
+    return df
+
+
+def to_records(df):
+    # Plain Python rows (None for missing values) for storage or JSON
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# On-disk cache for instrument -> symbol resolutions and recent prices
+CACHE_PATH = os.environ.get('RESOLUTION_CACHE_PATH', os.path.join('data', 'resolution_cache.sqlite3'))
+OVERRIDES_PATH = os.environ.get('SYMBOL_OVERRIDES_PATH', 'symbol_overrides.json')
+
+SYMBOL_TTL = int(os.environ.get('SYMBOL_TTL', 30 * 24 * 3600))
+NEGATIVE_TTL = int(os.environ.get('NEGATIVE_TTL', 24 * 3600))
+PRICE_TTL = int(os.environ.get('PRICE_TTL', 15 * 60))
+MAX_SYMBOL_ENTRIES = int(os.environ.get('MAX_SYMBOL_ENTRIES', 5000))
+MAX_PRICE_ENTRIES = int(os.environ.get('MAX_PRICE_ENTRIES', 5000))
+
+# Namespaces separate lookups that share the instrument name as key
+MANUAL = 'manual'
+JSE = 'jse'
+GOOGLE = 'google'
+REGION = 'region'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    instrument TEXT,
+    symbol TEXT,
+    region TEXT,
+    source TEXT,
+    link TEXT,
+    resolved_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS symbols_accessed ON symbols (pinned, accessed_at);
+CREATE TABLE IF NOT EXISTS prices (
+    symbol TEXT NOT NULL,
+    source TEXT NOT NULL,
+    price TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (symbol, source)
+);
+CREATE INDEX IF NOT EXISTS prices_accessed ON prices (accessed_at);
+"""
+
+
+def normalize_key(name):
+    # "PSG Financial Services Ltd" and "PSGFINANCIALSERVICESLTD" share a key
+    key = re.sub(r'[^A-Z0-9]', '', (name or '').upper())
+    key = re.sub(r'(LTD|LIMITED)$', '', key)
+    return key
+
+
+class ResolutionCache:
+    def __init__(self, path=CACHE_PATH, symbol_ttl=SYMBOL_TTL, negative_ttl=NEGATIVE_TTL,
+                 price_ttl=PRICE_TTL, max_symbols=MAX_SYMBOL_ENTRIES, max_prices=MAX_PRICE_ENTRIES):
+        self.path = path
+        self.symbol_ttl = symbol_ttl
+        self.negative_ttl = negative_ttl
+        self.price_ttl = price_ttl
+        self.max_symbols = max_symbols
+        self.max_prices = max_prices
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def get_symbol(self, namespace, name):
+        key = normalize_key(name)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT * FROM symbols WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            if row is None:
+                metrics.CACHE_LOOKUPS.inc(f'symbol:{namespace}', 'miss')
+                return None
+            ttl = self.symbol_ttl if row['symbol'] else self.negative_ttl
+            if not row['pinned'] and now - row['resolved_at'] > ttl:
+                self._conn.execute('DELETE FROM symbols WHERE namespace = ? AND key = ?', (namespace, key))
+                metrics.CACHE_LOOKUPS.inc(f'symbol:{namespace}', 'expired')
+                return None
+            self._conn.execute(
+                'UPDATE symbols SET accessed_at = ? WHERE namespace = ? AND key = ?', (now, namespace, key)
+            )
+            metrics.CACHE_LOOKUPS.inc(f'symbol:{namespace}', 'hit')
+            return dict(row)
+
+    def put_symbol(self, namespace, name, symbol, region=None, source=None, instrument=None, link=None, pinned=False):
+        # symbol=None records a negative result, kept for NEGATIVE_TTL
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO symbols '
+                '(namespace, key, instrument, symbol, region, source, link, resolved_at, accessed_at, pinned) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (namespace, normalize_key(name), instrument or name, symbol, region, source, link, now, now, int(pinned))
+            )
+            self._evict('symbols', self.max_symbols, 'WHERE pinned = 0')
+
+    def get_price(self, symbol, source):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT price, fetched_at FROM prices WHERE symbol = ? AND source = ?', (symbol, source)
+            ).fetchone()
+            if row is None or now - row['fetched_at'] > self.price_ttl:
+                metrics.CACHE_LOOKUPS.inc(f'price:{source}', 'miss' if row is None else 'expired')
+                return None
+            self._conn.execute(
+                'UPDATE prices SET accessed_at = ? WHERE symbol = ? AND source = ?', (now, symbol, source)
+            )
+            metrics.CACHE_LOOKUPS.inc(f'price:{source}', 'hit')
+            return row['price']
+
+    def put_price(self, symbol, source, price):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO prices (symbol, source, price, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (symbol, source, price, now, now)
+            )
+            self._evict('prices', self.max_prices)
+
+    def override(self, name, symbol, region='SA', source='Manual Mapping'):
+        self.put_symbol(MANUAL, name, symbol, region, source, pinned=True)
+
+    def remove_override(self, name):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM symbols WHERE namespace = ? AND key = ?', (MANUAL, normalize_key(name)))
+
+    def seed(self, path=OVERRIDES_PATH):
+        # Overrides file: {"PSG Financial Services": {"symbol": "PSG.JO", "region": "SA"}, ...}
+        # The file is the full set: overrides removed from it are dropped from the cache too
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        keys = [normalize_key(name) for name in overrides]
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                f"DELETE FROM symbols WHERE namespace = ? AND key NOT IN ({','.join('?' * len(keys))})",
+                [MANUAL] + keys
+            ).rowcount
+        if removed:
+            logger.info(f"Removed {removed} symbol overrides no longer in {path}")
+        for name, entry in overrides.items():
+            self.override(name, entry['symbol'], entry.get('region', 'SA'), entry.get('source', 'Manual Mapping'))
+        logger.info(f"Seeded {len(overrides)} symbol overrides from {path}")
+        return len(overrides)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM symbols WHERE pinned = 0')
+            self._conn.execute('DELETE FROM prices')
+
+    def _evict(self, table, max_entries, where=''):
+        # Drop the least recently used entries once the table grows past its bound
+        count = self._conn.execute(f'SELECT COUNT(*) FROM {table} {where}').fetchone()[0]
+        if count <= max_entries:
+            return
+        self._conn.execute(
+            f'DELETE FROM {table} WHERE rowid IN '
+            f'(SELECT rowid FROM {table} {where} ORDER BY accessed_at LIMIT ?)',
+            (count - max_entries,)
+        )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResolutionCache()
+            _cache.seed()
+        return _cache
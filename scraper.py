@@ -1,21 +1,26 @@
-import nest_asyncio
 import asyncio
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import os
-import requests
+import json
+import time
 from bs4 import BeautifulSoup
 from datetime import datetime
 from tqdm import tqdm
 import re
 import yfinance as yf
 import pandas as pd
-import time
 import logging
-from functools import lru_cache
 from googlesearch import search
-import random
-
-nest_asyncio.apply()
+from concurrent.futures import ThreadPoolExecutor
+from http_client import (fetch, fetch_all, call_with_retries, limiter, retry_budget,
+                         FETCH_WORKERS, YAHOO_HOST, GOOGLE_HOST)
+import resolution_cache
+import metrics
+from article_parser import parse_articles, TextArchive, PARSE_WORKERS, PARSE_POOL_MIN
+from jse_index import get_index
+from article_ledger import get_ledger, content_hash, month_key
+from dividend_store import get_store, CSV_COLUMNS
+from normalize import normalize_dividends, to_records
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,282 +32,504 @@ def sanitize_filename(filename):
     filename = filename.strip('. ').replace('..', '.')
     return filename if filename else 'unnamed_article'
 
-async def scrape_current_month_dividends():
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-    html_file = "dividends_page_current_month.html"
+BLOG_URL = "https://blogs.easyequities.co.za/topic/dividends-update"
+BLOG_HOST = "blogs.easyequities.co.za"
+LOAD_MORE_TIMEOUT = int(os.environ.get('LOAD_MORE_TIMEOUT', 30000))
+LINKS_PATH = os.environ.get('LINKS_PATH', os.path.join('data', 'dividends_links_current_month.jsonl'))
+# Test/benchmark hooks: each is awaited with every new Playwright page before it navigates
+page_hooks = []
+# Streaming pipeline batch sizes: articles fetched and parsed together, yfinance symbols priced
+# together, and rows appended to the pending snapshot together (or after SAVE_INTERVAL seconds)
+ARTICLE_BATCH = int(os.environ.get('ARTICLE_BATCH', 20))
+PRICE_BATCH = int(os.environ.get('PRICE_BATCH', 25))
+SAVE_BATCH = int(os.environ.get('SAVE_BATCH', 20))
+SAVE_INTERVAL = float(os.environ.get('SAVE_INTERVAL', 1.0))
+if PARSE_WORKERS > 1 and PARSE_POOL_MIN > ARTICLE_BATCH:
+    logger.warning(f"PARSE_POOL_MIN ({PARSE_POOL_MIN}) is above ARTICLE_BATCH ({ARTICLE_BATCH}), "
+                   f"so the parse pool will never be used")
+
+def parse_post_date(date_text):
+    for fmt in ["%B %d, %Y", "%d %B %Y", "%Y-%m-%d"]:
+        try:
+            return datetime.strptime(date_text.strip(), fmt)
+        except ValueError:
+            continue
+    logger.warning(f"Could not parse date: {date_text}")
+    return None
+
+# [href, post date text] for each article card; the date is the one post-date inside the link's
+# nearest ancestor that has one, or "" when that ancestor holds several (no per-card date)
+LINK_DATES_JS = '''els => els.map(e => {
+    let node = e.parentElement;
+    while (node && !node.querySelector('div.post-date')) node = node.parentElement;
+    const dates = node ? node.querySelectorAll('div.post-date') : [];
+    return [e.getAttribute("href") || "", dates.length === 1 ? dates[0].innerText : ""];
+})'''
+
+async def iter_current_month_article_links():
+    # Yields {"link", "date"} for each article as each "load more" page appears, newest first;
+    # date is the post date as YYYY-MM-DD, or None when the card has no parseable date
+    now = datetime.now()
+    ledger = get_ledger()
 
     async with async_playwright() as p:
         try:
             browser = await p.chromium.launch(headless=True)
+        except Exception as e:
+            logger.error(f"Failed to initialize Playwright browser: {e}")
+            raise
+        try:
             page = await browser.new_page()
+            for hook in page_hooks:
+                await hook(page)
             logger.info("Navigating to dividends page...")
-            await page.goto("https://blogs.easyequities.co.za/topic/dividends-update", timeout=60000)
-
-            with open(html_file, "w", encoding="utf-8") as file:
-                articles_found = True
-                with tqdm(desc="Loading current month articles", unit="page") as pbar:
-                    while articles_found:
-                        try:
-                            date_elements = await page.query_selector_all('div.post-date')
-                            articles_found = False
-
-                            for date_element in date_elements:
-                                date_text = await date_element.inner_text()
-                                try:
-                                    for fmt in ["%B %d, %Y", "%d %B %Y", "%Y-%m-%d"]:
-                                        try:
-                                            article_date = datetime.strptime(date_text.strip(), fmt)
-                                            break
-                                        except ValueError:
-                                            continue
-                                    else:
-                                        logger.warning(f"Could not parse date: {date_text}")
-                                        continue
-
-                                    logger.info(f"Found article dated: {date_text}")
-                                    if article_date.year == current_year and article_date.month == current_month:
-                                        articles_found = True
-                                    else:
-                                        articles_found = False
-                                        break
-                                except Exception as e:
-                                    logger.error(f"Error parsing date '{date_text}': {e}")
-                                    continue
-
-                            content = await page.content()
-                            file.write(content)
-
-                            if articles_found:
-                                load_more_button = await page.query_selector('a#loadMore')
-                                if load_more_button:
-                                    await page.wait_for_selector('a#loadMore', state='visible', timeout=60000)
-                                    await load_more_button.click()
-                                    await page.wait_for_timeout(6000)
-                                    pbar.update(1)
-                                else:
-                                    logger.info("No more articles to load")
-                                    break
+            await page.goto(BLOG_URL, timeout=60000)
+
+            seen_dates = 0
+            seen_links = 0
+            with tqdm(desc="Loading current month articles", unit="page") as pbar:
+                while True:
+                    try:
+                        date_elements = await page.query_selector_all('div.post-date')
+                        new_dates = date_elements[seen_dates:]
+                        seen_dates = len(date_elements)
+                        articles_found = False
+                        for date_element in new_dates:
+                            date_text = await date_element.inner_text()
+                            article_date = parse_post_date(date_text)
+                            if article_date is None:
+                                continue
+                            logger.info(f"Found article dated: {date_text}")
+                            if article_date.year == now.year and article_date.month == now.month:
+                                articles_found = True
                             else:
-                                logger.info("No more articles from current month")
+                                articles_found = False
                                 break
-                        except Exception as e:
-                            logger.error(f"Error during scraping: {e}")
+
+                        cards = await page.eval_on_selector_all('a.LinkBox', LINK_DATES_JS)
+                        new_cards = cards[seen_links:]
+                        seen_links = len(cards)
+                        new_links = [link for link, _ in new_cards]
+                        for link, date_text in new_cards:
+                            post_date = parse_post_date(date_text) if date_text else None
+                            yield {"link": link, "date": post_date.strftime('%Y-%m-%d') if post_date else None}
+
+                        # Older articles never change, so stop once we reach one we already have
+                        if ledger.known(new_links):
+                            logger.info("Reached already-ingested articles, stopping pagination")
+                            break
+                        if not articles_found:
+                            logger.info("No more articles from current month")
                             break
+                        load_more_button = await page.query_selector('a#loadMore')
+                        if not load_more_button:
+                            logger.info("No more articles to load")
+                            break
+                        await page.wait_for_selector('a#loadMore', state='visible', timeout=60000)
+                        await limiter.acquire_async(BLOG_HOST)
+                        await load_more_button.click()
+                        # Wait for the new batch of posts rather than a fixed delay
+                        try:
+                            await page.wait_for_function(
+                                'n => document.querySelectorAll("div.post-date").length > n',
+                                arg=seen_dates, timeout=LOAD_MORE_TIMEOUT
+                            )
+                        except PlaywrightTimeoutError:
+                            logger.info(f"No new articles appeared within {LOAD_MORE_TIMEOUT} ms")
+                            break
+                        pbar.update(1)
+                    except Exception as e:
+                        logger.error(f"Error during scraping: {e}")
+                        break
+        finally:
             await browser.close()
-            return html_file
-        except Exception as e:
-            logger.error(f"Failed to initialize Playwright browser: {e}")
-            raise
 
-def process_dividend_data(html_file):
+async def scrape_current_month_dividends():
+    # Streams article links to a JSON-lines file as pagination discovers them
+    links_file = LINKS_PATH
+    if os.path.dirname(links_file):
+        os.makedirs(os.path.dirname(links_file), exist_ok=True)
+    with open(links_file, "w", encoding="utf-8") as file:
+        async for article in iter_current_month_article_links():
+            file.write(json.dumps(article) + "\n")
+            file.flush()
+    return links_file
+
+def no_progress(stage, done=None, total=None):
+    pass
+
+def chunked(items, size, max_wait=None):
+    # Lists of up to size items; with max_wait, a chunk is also cut once it has waited that many seconds
+    chunk, started = [], time.monotonic()
+    for item in items:
+        if not chunk:
+            started = time.monotonic()
+        chunk.append(item)
+        if len(chunk) >= size or (max_wait is not None and time.monotonic() - started >= max_wait):
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def read_article_links(links_file, month):
+    # Articles from the links file; each is filed under its post month, or `month` when undated
     try:
-        with open(html_file, "r", encoding="utf-8") as file:
-            soup = BeautifulSoup(file, 'html.parser')
+        with open(links_file, "r", encoding="utf-8") as file:
+            links = {}
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    links.setdefault(entry['link'], entry.get('date'))
     except FileNotFoundError:
-        logger.error(f"HTML file {html_file} not found.")
-        return {}
-
-    articles = soup.find_all('a', class_='LinkBox')
-    logger.info(f"Found {len(articles)} articles in {html_file}")
+        logger.error(f"Links file {links_file} not found.")
+        return []
 
-    article_data = []
-    Data = {}
+    logger.info(f"Found {len(links)} articles in {links_file}")
 
     def truncate_name(name, max_length=30):
         if len(name) > max_length:
             return name[:max_length]
         return name
 
-    def clean_instrument_name(name):
-        name = name.strip()
-        if len(name) > 100 or any(keyword in name.lower() for keyword in ['tariff', 'investor sentiment', 'bear market']):
-            return None
-        name = re.sub(r'\b(Limited|Corporation|Incorporated|PLC|SE|Group)\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\s+', ' ', name).strip()
-        return name if name else None
-
-    for article in articles:
-        title = article.text.strip()
-        link = article.get('href', '')
+    article_data = []
+    for link, date in links.items():
         if link.startswith('https://blogs.easyequities.co.za/'):
             article_data.append({
                 'title': truncate_name(str(link).replace('https://blogs.easyequities.co.za/','')),
-                'link': link
+                'link': link,
+                'month': date[:7] if date else month
             })
         else:
             logger.info(f"Skipping non-EasyEquities link: {link}")
-
-    for article in tqdm(article_data, desc="Scraping articles", unit="article"):
-        Data[article['title']] = {}
-        if article['link']:
-            try:
-                response = requests.get(article['link'])
-                soup = BeautifulSoup(response.content, 'html.parser')
-                content = soup.find_all('p')
-                Stff = ''
-                for y in content:
-                    Stff += y.text.strip() + '\n'
-                    text = y.text.strip()
-                    if 'per share' in text.lower():
-                        Fn = text.split('will be paying ')
-                        if len(Fn) > 1:
-                            instrument = clean_instrument_name(Fn[0])
-                            if instrument:
-                                Data[article['title']][instrument] = {"Dividends": str(Fn[-1]).replace('per share.', "")}
-                    elif 'dividend' in text.lower():
-                        match = re.search(r'(\w[\w\s]+?)\s+(?:dividend|pays|declares)\s+.*?([\d.]+)\s*(ZAR|USD|EUR|$|€|cents|pence)?', text, re.IGNORECASE)
-                        if match:
-                            instrument = clean_instrument_name(match.group(1))
-                            if instrument:
-                                dividend = match.group(2)
-                                currency = match.group(3) or ''
-                                Data[article['title']][instrument] = {"Dividends": f"{dividend} {currency}".strip()}
-                logger.info(f"Processed article: {article['title']} - {len(Data[article['title']])} dividend entries")
-            except Exception as e:
-                logger.error(f"Error scraping {article['title']}: {e}")
-        safe_filename = sanitize_filename(article['title'])
-        with open(f"{safe_filename}.txt", 'w', encoding='utf-8') as f:
-            f.write(Stff)
-
-    logger.info(f'Done scraping {len([n for n in Data.keys()])} sites')
-    return Data
-
-@lru_cache(maxsize=100)
-def get_yfinance_price(symbol):
-    for attempt in range(7):
+    return article_data
+
+def process_article_batch(articles, ledger, archive):
+    # Fetches one batch concurrently over the shared session and returns [(title, entries)] in order.
+    # Known articles are fetched conditionally and reuse their stored rows when unchanged. Failed
+    # fetches keep an article's last good rows, or leave a new article pending in the ledger.
+    links = [article['link'] for article in articles]
+    responses = dict(zip(links, fetch_all(links, headers_for=ledger.conditional_headers)))
+    results = {}
+    to_parse = []
+    for article in articles:
+        results[article['link']] = {}
         try:
-            ticker = yf.Ticker(symbol)
-            price = ticker.history(period="1d")['Close'].iloc[-1]
-            return f"{price:.2f}", "yfinance"
+            response, error = responses[article['link']]
+            if error:
+                raise error
+            entry = ledger.get(article['link'])
+            if entry and response.status_code == 304:
+                results[article['link']] = entry['rows']
+                ledger.touch(article['link'])
+                continue
+            if not response.ok:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            digest = content_hash(response.content)
+            if entry and entry['content_hash'] == digest:
+                results[article['link']] = entry['rows']
+                ledger.record(article['link'], article['title'], article['month'], digest,
+                              response.headers.get('ETag'), response.headers.get('Last-Modified'), entry['rows'])
+                continue
+            to_parse.append((article, response, digest))
         except Exception as e:
-            if "Too Many Requests" in str(e):
-                delay = 5 * (2 ** attempt)
-                logger.warning(f"Rate limit hit for {symbol}, retrying ({attempt+1}/7) after {delay}s...")
-                time.sleep(delay)
+            logger.error(f"Error scraping {article['title']}: {e}")
+            entry = ledger.get(article['link'])
+            if entry and not entry['pending']:
+                results[article['link']] = entry['rows']
             else:
-                logger.error(f"Error fetching yfinance price for {symbol}: {e}")
-                return "0.00", "yfinance"
-    logger.error(f"Failed to fetch price for {symbol} after 7 attempts.")
-    return "0.00", "yfinance"
+                ledger.record_failure(article['link'], article['title'], article['month'])
+                archive.add(sanitize_filename(article['title']), '', article['month'])
+
+    # Only new or changed articles are parsed, as one batch so it can use the process pool
+    parsed = parse_articles(response.content for _, response, _ in to_parse)
+    for (article, response, digest), (entries, text) in zip(to_parse, parsed):
+        results[article['link']] = entries
+        archive.add(sanitize_filename(article['title']), text, article['month'])
+        logger.info(f"Processed article: {article['title']} - {len(entries)} dividend entries")
+        ledger.record(article['link'], article['title'], article['month'], digest,
+                      response.headers.get('ETag'), response.headers.get('Last-Modified'), entries)
+    return [(article['title'], results[article['link']]) for article in articles]
+
+def iter_articles(links_file, progress=no_progress):
+    # Stage 1: yields (title, {instrument: details}) per article, one fetched-and-parsed batch at a time
+    ledger = get_ledger()
+    month = month_key(datetime.now())
+    article_data = read_article_links(links_file, month)
+
+    # Articles ingested earlier this month that pagination no longer reaches
+    on_page = {article['link'] for article in article_data}
+    stored = [entry for entry in ledger.for_month(month) if entry['url'] not in on_page]
+    # Articles whose fetch failed on an earlier run; pagination may stop before reaching them again
+    retry = [{'title': entry['title'], 'link': entry['url'], 'month': entry['month']}
+             for entry in ledger.pending() if entry['url'] not in on_page]
+    if retry:
+        logger.info(f"Retrying {len(retry)} articles whose fetch failed before")
+        article_data += retry
+
+    total = len(article_data) + len(stored)
+    done = 0
+    progress("processing articles", 0, total)
+    with TextArchive() as archive, tqdm(total=total, desc="Processing articles", unit="article") as bar:
+        for batch in chunked(article_data, ARTICLE_BATCH):
+            with metrics.stage('process'):
+                results = process_article_batch(batch, ledger, archive)
+            for title, entries in results:
+                done += 1
+                bar.update()
+                progress("processing articles", done)
+                yield title, entries
+    for entry in stored:
+        done += 1
+        progress("processing articles", done)
+        yield entry['title'], entry['rows']
+    logger.info(f"Reused stored extraction for {len(stored)} articles not on the listing")
+    logger.info(f'Done scraping {total} sites')
+
+def process_dividend_data(links_file, progress=no_progress):
+    # {title: {instrument: details}} for every article, collected in one go
+    return dict(iter_articles(links_file, progress))
+
+def get_yfinance_price(symbol):
+    cache = resolution_cache.get_cache()
+    cached = cache.get_price(symbol, "yfinance")
+    if cached is not None:
+        return cached, "yfinance"
+    try:
+        history = call_with_retries(YAHOO_HOST, lambda: yf.Ticker(symbol).history(period="1d"))
+        price = f"{history['Close'].iloc[-1]:.2f}"
+        cache.put_price(symbol, "yfinance", price)
+        return price, "yfinance"
+    except Exception as e:
+        logger.error(f"Error fetching yfinance price for {symbol}: {e}")
+        return "0.00", "yfinance"
+
+def yfinance_region(currency, exchange):
+    currency = (currency or '').upper()
+    exchange = (exchange or '').upper()
+    if currency == 'USD' or exchange in ['NYQ', 'NAS', 'AMX']:
+        return 'USA'
+    elif currency == 'EUR' or exchange in ['FRA', 'PAR', 'AMS', 'MCE']:
+        return 'EUR'
+    return 'Unknown'
 
-@lru_cache(maxsize=100)
 def get_yfinance_region(symbol):
-    for attempt in range(7):
+    cache = resolution_cache.get_cache()
+    cached = cache.get_symbol(resolution_cache.REGION, symbol)
+    if cached is not None:
+        return cached['region'], "yfinance"
+    try:
+        info = call_with_retries(YAHOO_HOST, lambda: yf.Ticker(symbol).info)
+        region = yfinance_region(info.get('currency', ''), info.get('exchange', ''))
+        cache.put_symbol(resolution_cache.REGION, symbol, symbol, region, "yfinance")
+        return region, "yfinance"
+    except Exception as e:
+        logger.error(f"Error determining region for {symbol}: {e}")
+        return 'Unknown', "yfinance"
+
+def get_yfinance_quotes(symbols):
+    # Price and region for many symbols at once, as a DataFrame indexed by Symbol.
+    # Prices come from one multi-ticker download, region metadata is fetched
+    # concurrently, and only symbols the batch missed fall back to per-symbol calls.
+    symbols = list(dict.fromkeys(symbols))
+    quotes = pd.DataFrame(index=pd.Index(symbols, name="Symbol"), columns=["Price", "Region"])
+    quotes["Price"] = quotes["Price"].astype("float64")
+    if not symbols:
+        return quotes
+    cache = resolution_cache.get_cache()
+
+    for symbol in symbols:
+        cached_price = cache.get_price(symbol, "yfinance")
+        if cached_price is not None:
+            quotes.at[symbol, "Price"] = float(cached_price)
+        cached_region = cache.get_symbol(resolution_cache.REGION, symbol)
+        if cached_region is not None:
+            quotes.at[symbol, "Region"] = cached_region['region']
+
+    missing_prices = quotes.index[quotes["Price"].isna()].tolist()
+    if missing_prices:
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            currency = info.get('currency', '').upper()
-            exchange = info.get('exchange', '').upper()
-            if currency == 'USD' or exchange in ['NYQ', 'NAS', 'AMX']:
-                return 'USA', "yfinance"
-            elif currency == 'EUR' or exchange in ['FRA', 'PAR', 'AMS', 'MCE']:
-                return 'EUR', "yfinance"
-            else:
-                return 'Unknown', "yfinance"
+            history = call_with_retries(YAHOO_HOST, lambda: yf.download(
+                missing_prices, period="1d", group_by="column", progress=False, threads=True
+            ))
+            close = history["Close"]
+            if isinstance(close, pd.Series):
+                close = close.to_frame(missing_prices[0])
+            last = close.ffill().iloc[-1].dropna()
+            quotes.loc[last.index, "Price"] = last.astype("float64")
+            for symbol, price in last.items():
+                cache.put_price(symbol, "yfinance", f"{price:.2f}")
         except Exception as e:
-            if "Too Many Requests" in str(e):
-                delay = 5 * (2 ** attempt)
-                logger.warning(f"Rate limit hit for {symbol}, retrying ({attempt+1}/7) after {delay}s...")
-                time.sleep(delay)
-            else:
-                logger.error(f"Error determining region for {symbol}: {e}")
-                return 'Unknown', "yfinance"
-    logger.error(f"Failed to determine region for {symbol} after 7 attempts.")
-    return 'Unknown', "yfinance"
+            logger.error(f"Batch yfinance download failed for {len(missing_prices)} symbols: {e}")
 
-def google_search_instrument(instrument_name):
-    symbol_map = {
-        'PSG Financial Services': ('PSG.JO', 'SA', 'Manual Mapping'),
-        'PSGFINANCIALSERVICESLTD': ('PSG.JO', 'SA', 'Manual Mapping')
-    }
-    if instrument_name in symbol_map:
-        return symbol_map[instrument_name]
-
-    for attempt in range(3):
+    def read_metadata(symbol):
+        fast_info = yf.Ticker(symbol).fast_info
+        return fast_info['currency'], fast_info['exchange']
+
+    def fetch_region(symbol):
         try:
-            query = f"{instrument_name} stock symbol"
-            for url in search(query, num_results=3):
-                time.sleep(random.uniform(2, 5))
-                try:
-                    response = requests.get(url, timeout=10)
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    if 'jse.co.za' in url:
-                        symbol_tag = soup.find('div', class_='field--name-field-alpha-code')
-                        if symbol_tag:
-                            symbol = symbol_tag.find('span').text.strip()
-                            return symbol, 'SA', 'JSE'
-                    title = soup.find('title').text.lower() if soup.find('title') else ''
-                    if 'bloomberg' in url or 'reuters' in url or 'finance.yahoo.com' in url:
-                        symbol_match = re.search(r'\b([A-Z0-9]+(\.JO|\.L|\.DE|\.PA|\.AS)?)\b', title)
-                        if symbol_match:
-                            symbol = symbol_match.group(1)
-                            if symbol.endswith('.JO'):
-                                return symbol, 'SA', 'Financial Site'
-                            elif symbol.endswith(('.L', '.DE', '.PA', '.AS')):
-                                region = 'EUR' if symbol.endswith(('.DE', '.PA', '.AS')) else 'USA'
-                                return symbol, region, 'Financial Site'
-                            else:
-                                region, _ = get_yfinance_region(symbol)
-                                return symbol, region, 'Financial Site'
-                except Exception as e:
-                    logger.warning(f"Error processing URL {url} for {instrument_name}: {e}")
-                    continue
-            return None, 'Unknown', 'Google Search'
+            currency, exchange = call_with_retries(YAHOO_HOST, lambda: read_metadata(symbol))
+            return symbol, yfinance_region(currency, exchange)
         except Exception as e:
-            logger.error(f"Google search error for {instrument_name} (attempt {attempt+1}/3): {e}")
-            time.sleep(10 * (2 ** attempt))
-    logger.error(f"Failed to search Google for {instrument_name} after 3 attempts.")
-    return None, 'Unknown', 'Google Search'
+            logger.warning(f"Batch region lookup failed for {symbol}: {e}")
+            return symbol, None
+
+    missing_regions = quotes.index[quotes["Region"].isna()].tolist()
+    if missing_regions:
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(missing_regions))) as pool:
+            for symbol, region in pool.map(fetch_region, missing_regions):
+                if region is not None:
+                    quotes.at[symbol, "Region"] = region
+                    cache.put_symbol(resolution_cache.REGION, symbol, symbol, region, "yfinance")
+
+    # Per-symbol fallback for whatever the batch could not fill
+    for symbol in quotes.index[quotes["Price"].isna()]:
+        price, _ = get_yfinance_price(symbol)
+        if price != "0.00":
+            quotes.at[symbol, "Price"] = float(price)
+    for symbol in quotes.index[quotes["Region"].isna()]:
+        quotes.at[symbol, "Region"], _ = get_yfinance_region(symbol)
+
+    quotes["Source"] = "yfinance"
+    return quotes
 
-def google_finance_price(symbol):
-    for attempt in range(3):
+def google_search_instrument(instrument_name):
+    cache = resolution_cache.get_cache()
+    for namespace in (resolution_cache.MANUAL, resolution_cache.GOOGLE):
+        cached = cache.get_symbol(namespace, instrument_name)
+        if cached is not None:
+            return cached['symbol'], cached['region'], cached['source']
+
+    def remember(symbol, region, source):
+        cache.put_symbol(resolution_cache.GOOGLE, instrument_name, symbol, region, source)
+        return symbol, region, source
+
+    try:
+        query = f"{instrument_name} stock symbol"
+        urls = call_with_retries(GOOGLE_HOST, lambda: list(search(query, num_results=3)))
+    except Exception as e:
+        logger.error(f"Google search error for {instrument_name}: {e}")
+        return None, 'Unknown', 'Google Search'
+
+    # A miss is only cached when every result was checked; a transient error is retried next run
+    failed = False
+    for url in urls:
         try:
-            query = f"{symbol} stock price site:finance.google.com"
-            for url in search(query, num_results=1):
-                time.sleep(random.uniform(2, 5))
-                if "finance.google.com" in url:
-                    response = requests.get(url)
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    price_tag = soup.find('div', class_='YMlKec fxKbKc')
-                    if price_tag:
-                        price = price_tag.text.strip().replace('$', '').replace('€', '')
-                        return f"{float(price):.2f}", "Google Finance"
-            return "0.00", "Google Finance"
+            response = fetch(url, timeout=10)
+            soup = BeautifulSoup(response.text, 'html.parser')
+            if 'jse.co.za' in url:
+                symbol_tag = soup.find('div', class_='field--name-field-alpha-code')
+                if symbol_tag:
+                    symbol = symbol_tag.find('span').text.strip()
+                    return remember(symbol, 'SA', 'JSE')
+            title = soup.find('title').text.lower() if soup.find('title') else ''
+            if 'bloomberg' in url or 'reuters' in url or 'finance.yahoo.com' in url:
+                symbol_match = re.search(r'\b([A-Z0-9]+(\.JO|\.L|\.DE|\.PA|\.AS)?)\b', title)
+                if symbol_match:
+                    symbol = symbol_match.group(1)
+                    if symbol.endswith('.JO'):
+                        return remember(symbol, 'SA', 'Financial Site')
+                    elif symbol.endswith(('.L', '.DE', '.PA', '.AS')):
+                        region = 'EUR' if symbol.endswith(('.DE', '.PA', '.AS')) else 'USA'
+                        return remember(symbol, region, 'Financial Site')
+                    else:
+                        region, _ = get_yfinance_region(symbol)
+                        return remember(symbol, region, 'Financial Site')
         except Exception as e:
-            logger.error(f"Google Finance price error for {symbol} (attempt {attempt+1}/3): {e}")
-            time.sleep(10 * (2 ** attempt))
-    logger.error(f"Failed to fetch Google Finance price for {symbol} after 3 attempts.")
-    return "0.00", "Google Finance"
-
-def save_to_csv(dividend_data):
-    csv_data = []
-    unknown_instruments = []
+            failed = True
+            logger.warning(f"Error processing URL {url} for {instrument_name}: {e}")
+    if failed:
+        return None, 'Unknown', 'Google Search'
+    return remember(None, 'Unknown', 'Google Search')
+
+def google_finance_price(symbol):
+    cache = resolution_cache.get_cache()
+    cached = cache.get_price(symbol, "Google Finance")
+    if cached is not None:
+        return cached, "Google Finance"
+    try:
+        query = f"{symbol} stock price site:finance.google.com"
+        for url in call_with_retries(GOOGLE_HOST, lambda: list(search(query, num_results=1))):
+            if "finance.google.com" in url:
+                response = fetch(url)
+                soup = BeautifulSoup(response.text, 'html.parser')
+                price_tag = soup.find('div', class_='YMlKec fxKbKc')
+                if price_tag:
+                    price = price_tag.text.strip().replace('$', '').replace('€', '')
+                    price = f"{float(price):.2f}"
+                    cache.put_price(symbol, "Google Finance", price)
+                    return price, "Google Finance"
+        return "0.00", "Google Finance"
+    except Exception as e:
+        logger.error(f"Google Finance price error for {symbol}: {e}")
+        return "0.00", "Google Finance"
+
+def iter_priced_rows(articles):
+    # Stages 2-4: (title, entries) pairs in, one priced row per (article, instrument) out.
+    # Each distinct instrument is resolved once; rows waiting on yfinance are held back
+    # until PRICE_BATCH symbols can be priced in one batch.
+    unknown_instruments = set()
     BASE_URL = "https://www.jse.co.za"
     WORD_REPLACEMENTS = {"Property": "Prop", "Funding": "Fund", "Limited": "Ltd"}
 
+    cache = resolution_cache.get_cache()
+    index = get_index()
+    if index.is_stale():
+        index.refresh(fetch)
+
     def get_jse_price(instrument_url):
+        cached = cache.get_price(instrument_url, "JSE")
+        if cached is not None:
+            return cached, "JSE"
         try:
-            response = requests.get(instrument_url)
+            response = fetch(instrument_url)
             soup = BeautifulSoup(response.text, "html.parser")
             price_tag = soup.find("div", class_="instrument-delta__price")
-            return price_tag.text.replace("Price", "").strip(), "JSE"
+            price = price_tag.text.replace("Price", "").strip()
+            cache.put_price(instrument_url, "JSE", price)
+            return price, "JSE"
         except Exception as e:
             logger.error(f"Error fetching JSE price: {e}")
             return "0.00", "JSE"
 
     def search_jse_instrument(name):
-        symbol_map = {
-            'PSG Financial Services': 'PSG.JO',
-            'PSGFINANCIALSERVICESLTD': 'PSG.JO'
-        }
-        if name in symbol_map:
+        manual = cache.get_symbol(resolution_cache.MANUAL, name)
+        if manual is not None:
+            link = f"{BASE_URL}/instruments/{manual['symbol'].replace('.', '')}"
             return {
                 "Instrument": name,
-                "Symbol": symbol_map[name],
-                "Price": get_jse_price(f"{BASE_URL}/instruments/{symbol_map[name].replace('.', '')}")[0],
-                "Link": f"{BASE_URL}/instruments/{symbol_map[name].replace('.', '')}",
-                "Source": "Manual Mapping"
+                "Symbol": manual['symbol'],
+                "Price": get_jse_price(link)[0],
+                "Link": link,
+                "Source": manual['source']
+            }
+
+        cached = cache.get_symbol(resolution_cache.JSE, name)
+        if cached is not None:
+            if cached['symbol'] is None:
+                return {"Instrument": name, "Symbol": "N/A", "Price": "0.00", "Link": "N/A", "Source": "JSE"}
+            price, source = get_jse_price(cached['link']) if cached['link'] != "N/A" else ("0.00", "JSE")
+            return {
+                "Instrument": cached['instrument'],
+                "Symbol": cached['symbol'],
+                "Price": price,
+                "Link": cached['link'],
+                "Source": source
+            }
+
+        # Confident matches against the local instrument index skip the network search
+        entry, score = index.best_match(name)
+        metrics.CACHE_LOOKUPS.inc('jse_index', 'miss' if entry is None else 'hit')
+        if entry is not None:
+            logger.info(f"Matched {name} to {entry['name']} ({entry['code']}) in JSE index, score {score:.2f}")
+            cache.put_symbol(resolution_cache.JSE, name, entry['code'], "SA", "JSE",
+                             instrument=entry['name'], link=entry['url'])
+            price, source = get_jse_price(entry['url'])
+            return {
+                "Instrument": entry['name'],
+                "Symbol": entry['code'],
+                "Price": price,
+                "Link": entry['url'],
+                "Source": source
             }
 
         search_queries = [name]
@@ -314,92 +541,172 @@ def save_to_csv(dividend_data):
         first_word = name.split()[:2]
         search_queries.append(" ".join(first_word))
 
+        failed = False
         for query in search_queries:
-            search_url = f"{BASE_URL}/search?keys={query}"
+            search_url = f"{BASE_URL}/search"
             try:
-                response = requests.get(search_url)
+                response = fetch(search_url, params={"keys": query})
                 soup = BeautifulSoup(response.text, "html.parser")
                 search_results = soup.find_all("div", class_="search-result search-result--instrument")
-                instruments = []
 
-                for result in search_results:
+                # Only the first result is used, so only its price is fetched
+                if search_results:
+                    result = search_results[0]
                     link_tag = result.find("a")
                     instrument_name = link_tag.text.strip() if link_tag else "N/A"
                     instrument_link = f"{BASE_URL}{link_tag['href']}" if link_tag else "N/A"
                     symbol_tag = result.find("div", class_="field--name-field-alpha-code")
                     symbol = symbol_tag.find("span").text.strip() if symbol_tag else "N/A"
+                    cache.put_symbol(resolution_cache.JSE, name, symbol, "SA", "JSE",
+                                     instrument=instrument_name, link=instrument_link)
+                    index.add(instrument_name, symbol, instrument_link)
                     price, source = get_jse_price(instrument_link) if instrument_link != "N/A" else ("0.00", "JSE")
-                    instruments.append({
+                    return {
                         "Instrument": instrument_name,
                         "Symbol": symbol,
                         "Price": price,
                         "Link": instrument_link,
                         "Source": source
-                    })
-
-                if instruments:
-                    return instruments[0]
+                    }
             except Exception as e:
+                failed = True
                 logger.error(f"Error searching JSE for {query}: {e}")
+        if not failed:
+            cache.put_symbol(resolution_cache.JSE, name, None, "SA", "JSE")
         return {"Instrument": name, "Symbol": "N/A", "Price": "0.00", "Link": "N/A", "Source": "JSE"}
 
-    for article in dividend_data:
-        for instrument, details in dividend_data[article].items():
-            dividend = details.get("Dividends", "N/A")
-            jse_result = search_jse_instrument(instrument)
-            if jse_result["Price"] != "0.00" and jse_result["Symbol"] != "N/A":
-                csv_data.append({
-                    "Region": "SA",
-                    "Instrument": jse_result["Instrument"],
-                    "Symbol": jse_result["Symbol"],
-                    "Dividend": dividend,
-                    "Price": jse_result["Price"],
-                    "Article": article,
-                    "Source": jse_result["Source"]
-                })
+    def resolve_instrument(instrument):
+        jse_result = search_jse_instrument(instrument)
+        if jse_result["Price"] != "0.00" and jse_result["Symbol"] != "N/A":
+            return {
+                "Region": "SA",
+                "Instrument": jse_result["Instrument"],
+                "Symbol": jse_result["Symbol"],
+                "Price": jse_result["Price"],
+                "Source": jse_result["Source"]
+            }
+        google_symbol, region, source = google_search_instrument(instrument)
+        if google_symbol:
+            price, price_source = google_finance_price(google_symbol)
+            return {
+                "Region": region,
+                "Instrument": instrument,
+                "Symbol": google_symbol,
+                "Price": price,
+                "Source": price_source
+            }
+        # Priced below in one batch together with the other yfinance symbols
+        return {
+            "Region": None,
+            "Instrument": instrument,
+            "Symbol": instrument.replace(" ", "").upper(),
+            "Price": None,
+            "Source": "yfinance"
+        }
+
+    resolved = {}
+    unpriced = {}
+    waiting = []
+
+    def make_row(article, instrument, details):
+        result = resolved[instrument]
+        if result["Source"] == "yfinance" and result["Region"] == "Unknown":
+            unknown_instruments.add(f"{instrument} ({result['Symbol']})")
+        return {
+            "Region": result["Region"],
+            "Instrument": result["Instrument"],
+            "Symbol": result["Symbol"],
+            "Dividend": details.get("Dividends", "N/A"),
+            "Price": result["Price"],
+            "Article": article,
+            "Source": result["Source"]
+        }
+
+    def price_waiting():
+        with metrics.stage('price'):
+            quotes = get_yfinance_quotes([result["Symbol"] for result in unpriced.values()])
+        for result in unpriced.values():
+            price = quotes.at[result["Symbol"], "Price"]
+            result["Region"] = quotes.at[result["Symbol"], "Region"]
+            result["Price"] = "0.00" if pd.isna(price) else f"{price:.2f}"
+        unpriced.clear()
+        rows = [make_row(*row) for row in waiting]
+        waiting.clear()
+        return rows
+
+    for article, entries in articles:
+        for instrument, details in entries.items():
+            if instrument not in resolved:
+                with metrics.stage('resolve'):
+                    resolved[instrument] = resolve_instrument(instrument)
+                if resolved[instrument]["Source"] == "yfinance" and resolved[instrument]["Price"] is None:
+                    unpriced[instrument] = resolved[instrument]
+            if instrument in unpriced:
+                waiting.append((article, instrument, details))
             else:
-                google_symbol, region, source = google_search_instrument(instrument)
-                if google_symbol:
-                    symbol = google_symbol
-                    price, price_source = google_finance_price(symbol)
-                    csv_data.append({
-                        "Region": region,
-                        "Instrument": instrument,
-                        "Symbol": symbol,
-                        "Dividend": dividend,
-                        "Price": price,
-                        "Article": article,
-                        "Source": price_source
-                    })
-                else:
-                    symbol = instrument.replace(" ", "").upper()
-                    region, region_source = get_yfinance_region(symbol)
-                    price, price_source = get_yfinance_price(symbol)
-                    csv_data.append({
-                        "Region": region,
-                        "Instrument": instrument,
-                        "Symbol": symbol,
-                        "Dividend": dividend,
-                        "Price": price,
-                        "Article": article,
-                        "Source": price_source
-                    })
-                    if region == "Unknown":
-                        unknown_instruments.append(f"{instrument} ({symbol})")
-
-    df = pd.DataFrame(csv_data)
-    df = df.sort_values(by=["Region", "Instrument"])
-
-    csv_file = os.path.join('static', 'data', 'dividends_with_prices_current_month.csv')
-    df.to_csv(csv_file, index=False, encoding='utf-8')
-    logger.info(f"Saved dividend data to {csv_file}")
+                yield make_row(article, instrument, details)
+        if len(unpriced) >= PRICE_BATCH:
+            yield from price_waiting()
+    if unpriced:
+        yield from price_waiting()
+
+    if index.dirty:
+        with metrics.stage('save'):
+            index.save()
+    logger.info(f"Resolved {len(resolved)} distinct instruments")
     if unknown_instruments:
-        logger.info(f"Instruments in Unknown section: {', '.join(set(unknown_instruments))}")
-
-def scrape_and_process_dividends():
-    html_file = asyncio.run(scrape_current_month_dividends())
-    dividend_data = process_dividend_data(html_file)
-    if dividend_data:
-        save_to_csv(dividend_data)
-    else:
-        logger.warning("No dividend data scraped")
+        logger.info(f"Instruments in Unknown section: {', '.join(sorted(unknown_instruments))}")
+
+def save_rows(rows, progress=no_progress, month=None):
+    # Stage 5: appends rows to a pending snapshot as they arrive and publishes it once all are in;
+    # /data keeps serving the previous snapshot until then. Returns the number of rows saved.
+    store = get_store()
+    snapshot_id = store.begin_snapshot(month)
+    saved = 0
+    try:
+        for batch in chunked(rows, SAVE_BATCH, SAVE_INTERVAL):
+            with metrics.stage('save'):
+                saved += store.append_rows(snapshot_id, to_records(
+                    normalize_dividends(pd.DataFrame(batch, columns=CSV_COLUMNS))))
+    except BaseException:
+        store.discard(snapshot_id)
+        raise
+    if not saved:
+        store.discard(snapshot_id)
+        return 0
+    progress("publishing", saved, saved)
+    with metrics.stage('save'):
+        store.publish(snapshot_id)
+    logger.info(f"Saved dividend data to {store.path}")
+    return saved
+
+def save_to_csv(dividend_data, progress=no_progress):
+    # Resolves, prices and stores already-extracted {title: {instrument: details}} data
+    return save_rows(iter_priced_rows(dividend_data.items()), progress)
+
+def scrape_and_process_dividends(progress=no_progress):
+    retry_budget.reset()
+    metrics.start_run()
+    rows = 0
+    try:
+        progress("loading article list")
+        # Refreshes run in background threads, which have no event loop of their own
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            with metrics.stage('scrape'):
+                links_file = loop.run_until_complete(scrape_current_month_dividends())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        # Articles, priced rows and saved rows stream through the stages, so rows reach
+        # the pending snapshot (and /stream) while later articles are still being fetched
+        rows = save_rows(iter_priced_rows(iter_articles(links_file, progress)), progress)
+        if not rows:
+            logger.warning("No dividend data scraped")
+    except Exception:
+        metrics.finish_run(rows, 'failure')
+        raise
+    summary = metrics.finish_run(rows)
+    logger.info(f"Refresh finished in {summary['duration_seconds']}s: {summary['stages']}")
+    return rows
@@ -0,0 +1,179 @@
+import json
+import gzip
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+FILTER_COLUMNS = {'region': 'Region', 'symbol': 'Symbol', 'source': 'Source'}
+MAX_CACHED_QUERIES = 128
+# Snapshots of history reads (?month= / ?year= with their filters) kept per worker
+MAX_CACHED_HISTORY = 16
+MAX_LIMIT = 10000
+
+
+def encode_json(rows):
+    # Same layout as Flask's jsonify in production: sorted keys, compact separators
+    return json.dumps(rows, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _sort_key(value):
+    missing = value is None or value != value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return missing, 0, value if not missing else 0, ''
+    return missing, 1, 0, '' if missing else str(value).lower()
+
+
+class Payload:
+    # One serialized response body with its strong ETag and precompressed variants
+    def __init__(self, body, digest):
+        self.body = body
+        self.etag = digest
+        self.encoded = {'gzip': gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            self.encoded['br'] = brotli.compress(body)
+
+    def variant(self, accept_encodings):
+        # (content-encoding or None, body, etag) for the client's Accept-Encoding
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and encoding in accept_encodings:
+                return encoding, self.encoded[encoding], f"{self.etag}-{encoding}"
+        return None, self.body, self.etag
+
+    def etags(self):
+        return [self.etag] + [f"{self.etag}-{encoding}" for encoding in self.encoded]
+
+
+class Snapshot:
+    def __init__(self, rows):
+        self.rows = rows
+        self.columns = list(rows[0].keys()) if rows else []
+        body = encode_json(rows)
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.full = Payload(body, self.digest)
+        self.indexes = {}
+        for column in FILTER_COLUMNS.values():
+            index = {}
+            for row_id, row in enumerate(rows):
+                index.setdefault(str(row.get(column, '')).upper(), []).append(row_id)
+            self.indexes[column] = index
+        self.orders = {
+            column: sorted(range(len(rows)), key=lambda row_id: _sort_key(rows[row_id].get(column)))
+            for column in self.columns
+        }
+        # Rows with a value in each column; the missing ones follow them in self.orders
+        self.present = {
+            column: sum(not _sort_key(row.get(column))[0] for row in rows) for column in self.columns
+        }
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def query(self, args):
+        # args: mapping of query parameters; raises ValueError on bad input
+        filters = {}
+        for param, column in FILTER_COLUMNS.items():
+            if args.get(param):
+                filters[column] = tuple(sorted(value.strip().upper() for value in args[param].split(',')))
+        sort = args.get('sort')
+        if sort and sort not in self.orders:
+            raise ValueError(f"Cannot sort by {sort}; expected one of {', '.join(self.columns)}")
+        order = args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        try:
+            offset = int(args.get('offset', 0))
+            limit = int(args['limit']) if args.get('limit') else None
+        except ValueError:
+            raise ValueError("offset and limit must be integers")
+        if offset < 0 or (limit is not None and not 0 <= limit <= MAX_LIMIT):
+            raise ValueError(f"offset must be >= 0 and limit between 0 and {MAX_LIMIT}")
+
+        if not filters and not sort and not offset and limit is None:
+            return self.full
+
+        key = (tuple(sorted(filters.items())), sort, order, offset, limit)
+        with self._lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                return self._queries[key]
+
+        selected = None
+        for column, values in filters.items():
+            ids = set()
+            for value in values:
+                ids.update(self.indexes[column].get(value, ()))
+            selected = ids if selected is None else selected & ids
+        if sort:
+            ordered = self.orders[sort]
+            if order == 'desc':
+                # Missing values stay last in both directions
+                present = self.present[sort]
+                ordered = ordered[present - 1::-1] + ordered[present:] if present else ordered
+            row_ids = [row_id for row_id in ordered if selected is None or row_id in selected]
+        else:
+            row_ids = sorted(selected) if selected is not None else list(range(len(self.rows)))
+        row_ids = row_ids[offset:offset + limit if limit is not None else None]
+
+        digest = hashlib.sha256(f"{self.digest}:{key}".encode('utf-8')).hexdigest()[:32]
+        payload = Payload(encode_json([self.rows[row_id] for row_id in row_ids]), digest)
+        with self._lock:
+            self._queries[key] = payload
+            while len(self._queries) > MAX_CACHED_QUERIES:
+                self._queries.popitem(last=False)
+        return payload
+
+
+class SnapshotCache:
+    # Holds the serialized snapshot in memory, rebuilding only when version() changes.
+    # version() must be cheap (it runs on every request) and return None when there is no data.
+    def __init__(self, version, load_rows):
+        self.version = version
+        self.load_rows = load_rows
+        self._lock = threading.Lock()
+        self._version = None
+        self._snapshot = None
+
+    def current(self):
+        version = self.version()
+        if version is None:
+            return None
+        if version == self._version:
+            return self._snapshot
+        with self._lock:
+            if version != self._version:
+                self._snapshot = Snapshot(self.load_rows())
+                self._version = version
+                logger.info(f"Rebuilt /data snapshot for version {version} ({len(self._snapshot.rows)} rows)")
+            return self._snapshot
+
+
+class HistoryCache:
+    # LRU of Snapshots for history reads, keyed on the store version and the read's filters, so
+    # repeated reads skip the store query, sorting and compression until a snapshot is published
+    def __init__(self, version, load_rows, size=MAX_CACHED_HISTORY):
+        self.version = version
+        self.load_rows = load_rows
+        self.size = size
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+
+    def get(self, key):
+        # key: hashable read parameters, passed on to load_rows(key)
+        full_key = (self.version(), key)
+        with self._lock:
+            if full_key in self._snapshots:
+                self._snapshots.move_to_end(full_key)
+                return self._snapshots[full_key]
+        snapshot = Snapshot(self.load_rows(key))
+        with self._lock:
+            self._snapshots[full_key] = snapshot
+            while len(self._snapshots) > self.size:
+                self._snapshots.popitem(last=False)
+        return snapshot
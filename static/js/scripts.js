@@ -1,6 +1,6 @@
 document.addEventListener('DOMContentLoaded', () => {
     // Load data from server
-    fetch('/data')
+    fetch('/data', { cache: 'no-cache' })
         .then(response => response.json())
         .then(data => {
             populateTable(data);
@@ -16,37 +16,118 @@ document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('refreshData').addEventListener('click', refreshData);
 
     function refreshData() {
-        document.getElementById('refreshButton').disabled = true;
+        const button = document.getElementById('refreshButton');
+        button.disabled = true;
         fetch('/refresh')
             .then(response => response.json())
             .then(result => {
-                if (result.status === 'success') {
-                    // Reload data
-                    fetch('/data')
-                        .then(response => response.json())
-                        .then(data => {
-                            populateTable(data);
-                            createChart(data);
-                            alert('Data refreshed successfully!');
-                        });
+                if (window.EventSource) {
+                    streamRefresh(result.job.id);
                 } else {
-                    alert('Error refreshing data: ' + result.message);
+                    pollRefresh(result.job.id);
                 }
             })
             .catch(error => {
                 console.error('Error refreshing data:', error);
                 alert('Failed to refresh data.');
+                button.disabled = false;
+            });
+    }
+
+    function showProgress(job) {
+        const button = document.getElementById('refreshButton');
+        const percent = job.progress != null ? ` ${Math.round(job.progress * 100)}%` : '';
+        button.innerHTML = `<i class="fas fa-sync-alt fa-spin"></i> ${job.stage || 'Queued'}${percent}`;
+    }
+
+    // Always reload the published snapshot: after a failure it replaces rows streamed from the
+    // discarded pending snapshot
+    function finishRefresh(status, error) {
+        const button = document.getElementById('refreshButton');
+        button.innerHTML = '<i class="fas fa-sync-alt"></i> Refresh Data';
+        button.disabled = false;
+        fetch('/data', { cache: 'no-cache' })
+            .then(response => response.json())
+            .then(data => {
+                populateTable(data);
+                createChart(data);
+                if (status === 'succeeded') {
+                    alert('Data refreshed successfully!');
+                } else if (status === 'unknown') {
+                    alert('Refresh status unknown: ' + error);
+                } else {
+                    alert('Error refreshing data: ' + error);
+                }
             })
-            .finally(() => {
-                document.getElementById('refreshButton').disabled = false;
+            .catch(loadError => {
+                console.error('Error loading data:', loadError);
+                alert('Failed to load dividend data.');
+            });
+    }
+
+    // Render rows as the refresh produces them, then reload the published snapshot
+    function streamRefresh(jobId) {
+        const source = new EventSource(`/stream?job=${jobId}`);
+        let streaming = false;
+        source.addEventListener('progress', event => showProgress(JSON.parse(event.data)));
+        source.addEventListener('rows', event => {
+            const rows = JSON.parse(event.data);
+            if (!streaming) {
+                streaming = true;
+                populateTable([]);
+                createChart([]);
+            }
+            appendRows(rows);
+            appendChart(rows);
+        });
+        source.addEventListener('done', event => {
+            source.close();
+            const result = JSON.parse(event.data);
+            finishRefresh(result.status, result.error);
+        });
+        // Connections are capped server-side and the browser reconnects, resuming from the
+        // last event id; only fall back to polling once the browser gives up on the stream
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                pollRefresh(jobId);
+            }
+        };
+    }
+
+    // Poll the background refresh job until it finishes
+    function pollRefresh(jobId) {
+        const button = document.getElementById('refreshButton');
+        fetch(`/refresh/${jobId}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`status ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(job => {
+                if (job.status === 'succeeded' || job.status === 'failed') {
+                    finishRefresh(job.status, job.error);
+                } else {
+                    showProgress(job);
+                    setTimeout(() => pollRefresh(jobId), 2000);
+                }
+            })
+            .catch(error => {
+                console.error('Error checking refresh status:', error);
+                button.innerHTML = '<i class="fas fa-sync-alt"></i> Refresh Data';
+                button.disabled = false;
             });
     }
 
     // Populate table
     function populateTable(data) {
+        document.getElementById('dividendTable').innerHTML = '';
+        appendRows(data);
+    }
+
+    function appendRows(rows) {
         const tbody = document.getElementById('dividendTable');
-        tbody.innerHTML = '';
-        data.forEach(row => {
+        rows.forEach(row => {
             const tr = document.createElement('tr');
             tr.innerHTML = `
                 <td>${row.Region || 'N/A'}</td>
@@ -61,6 +142,21 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    function dividendAmount(row) {
+        if (row.DividendAmount !== undefined && row.DividendAmount !== null) {
+            return row.DividendAmount;
+        }
+        const match = row.Dividend?.match(/[\d.]+/);
+        return match ? parseFloat(match[0]) : 0;
+    }
+
+    function appendChart(rows) {
+        const chart = window.dividendChart;
+        chart.data.labels.push(...rows.map(row => row.Instrument));
+        chart.data.datasets[0].data.push(...rows.map(dividendAmount));
+        chart.update('none');
+    }
+
     // Create bar chart
     function createChart(data) {
         const ctx = document.getElementById('dividendChart').getContext('2d');
@@ -69,10 +165,7 @@ document.addEventListener('DOMContentLoaded', () => {
             window.dividendChart.destroy();
         }
         const instruments = data.map(row => row.Instrument);
-        const dividends = data.map(row => {
-            const match = row.Dividend?.match(/[\d.]+/);
-            return match ? parseFloat(match[0]) : 0;
-        });
+        const dividends = data.map(dividendAmount);
 
         window.dividendChart = new Chart(ctx, {
             type: 'bar',